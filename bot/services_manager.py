@@ -63,6 +63,15 @@ class ServicesManager:
             logger.error(f"❌ Ошибка инициализации сервисов: {e}")
             raise
     
+    async def aclose(self):
+        """Освобождение сетевых ресурсов сервисов"""
+        validator = getattr(self, 'validator', None)
+        if validator is not None:
+            try:
+                await validator.aclose()
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка закрытия валидатора: {e}")
+    
     @classmethod
     def get_instance(cls) -> 'ServicesManager':
         """Получить экземпляр менеджера сервисов"""
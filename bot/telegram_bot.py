@@ -10,6 +10,7 @@ from telegram.ext import (
     CommandHandler,
     MessageHandler,
     CallbackQueryHandler,
+    TypeHandler,
     filters,
     ContextTypes,
     Defaults
@@ -19,6 +20,8 @@ from .handlers import MainRouter
 from utils.config import load_config
 from utils.logger import setup_logger
 from database.connection import init_database
+from utils.cache import cache_manager
+from utils.performance import log_performance_stats, current_user_id
 
 logger = setup_logger()
 
@@ -64,6 +67,7 @@ class AstroBot:
             # Запуск с правильным управлением event loop для версии 21.7
             await self.application.initialize()
             await self.application.start()
+            self._schedule_maintenance_jobs()
             await self.application.updater.start_polling(drop_pending_updates=True)
             
             # Ждем до отмены (используем правильный метод для 21.7)
@@ -95,15 +99,39 @@ class AstroBot:
                 if hasattr(self.application, '_initialized') and self.application._initialized:
                     await self.application.shutdown()
                 
+                await self.services.aclose()
+                
                 logger.info("✅ Telegram бот остановлен")
                 
         except Exception as e:
             logger.error(f"❌ Ошибка при остановке бота: {e}")
     
+    def _schedule_maintenance_jobs(self):
+        """Регистрация фоновых задач обслуживания в JobQueue приложения"""
+        job_queue = self.application.job_queue
+        if job_queue is None:
+            logger.warning("⚠️ JobQueue недоступен, фоновые задачи обслуживания не запущены")
+            return
+        
+        async def cleanup_cache_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+            cache_manager.cleanup_expired()
+        
+        async def performance_log_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+            log_performance_stats()
+        
+        # Задачи автоматически отменяются при остановке приложения
+        job_queue.run_repeating(cleanup_cache_job, interval=300, name="cache_cleanup")
+        job_queue.run_repeating(performance_log_job, interval=600, name="performance_log")
+        
+        logger.info("⏰ Фоновые задачи обслуживания запланированы")
+    
     def _register_handlers(self):
         """Регистрация обработчиков команд и сообщений"""
         app = self.application
         
+        # Запоминаем пользователя до остальных обработчиков (для rate_limit)
+        app.add_handler(TypeHandler(Update, self._track_current_user), group=-1)
+        
         # Обработчики команд
         app.add_handler(CommandHandler("start", self.handlers.start_command))
         app.add_handler(CommandHandler("help", self.handlers.help_command))
@@ -156,6 +184,15 @@ class AstroBot:
         
         logger.info("📝 Обработчики команд зарегистрированы")
     
+    async def _track_current_user(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Сохранение ID пользователя текущего обновления в контексте"""
+        # Контекст задачи обработки переживает обновление: без пользователя
+        # явно ставим 'anonymous', чтобы не унаследовать ID предыдущего
+        if update.effective_user:
+            current_user_id.set(str(update.effective_user.id))
+        else:
+            current_user_id.set('anonymous')
+    
     async def _setup_bot_commands(self):
         """Настройка команд меню бота"""
         try:
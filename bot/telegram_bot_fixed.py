@@ -5,7 +5,7 @@
 
 import asyncio
 import logging
-from typing import Optional
+from typing import List, Optional
 
 from telegram import Bot, Update
 from telegram.error import TelegramError
@@ -13,6 +13,8 @@ from telegram.error import TelegramError
 from .handlers.main_router import MainRouter
 from utils.config import load_config
 from utils.logger import setup_logger
+from utils.performance import current_user_id, periodic_performance_log
+from utils.cache import cleanup_cache_periodically
 from database.connection import init_database
 
 logger = setup_logger()
@@ -27,6 +29,10 @@ class AstroBot:
         self.bot: Optional[Bot] = None
         self.handlers: Optional[MainRouter] = None
         self.running = False
+        # stop() вызывают и finally в start(), и main: закрываем ресурсы один раз
+        self._stopped = False
+        # Фоновые задачи обслуживания (очистка кэша, статистика)
+        self._maintenance_tasks: List[asyncio.Task] = []
         
         # Проверяем наличие токена
         if not self.config.bot.token:
@@ -36,6 +42,10 @@ class AstroBot:
         # Создаем Bot напрямую
         self.bot = Bot(token=self.config.bot.token)
         
+        # Инициализируем менеджер сервисов (ссылка нужна, чтобы закрыть их при остановке)
+        from .services_manager import ServicesManager
+        self.services = ServicesManager.get_instance()
+        
         # Инициализируем обработчики
         self.handlers = MainRouter()
         
@@ -74,6 +84,7 @@ class AstroBot:
                         raise
             
             self.running = True
+            self._schedule_maintenance_jobs()
             logger.info("✅ Бот запущен и готов к работе")
             
             # Основной цикл polling
@@ -115,16 +126,37 @@ class AstroBot:
     
     async def stop(self):
         """Остановка бота"""
+        if self._stopped:
+            return
+        self._stopped = True
         try:
             self.running = False
+            for task in self._maintenance_tasks:
+                task.cancel()
+            await asyncio.gather(*self._maintenance_tasks, return_exceptions=True)
+            self._maintenance_tasks.clear()
+            
             if self.bot:
                 await self.bot.close()
+            await self.services.aclose()
             logger.info("✅ Бот остановлен")
         except Exception as e:
             logger.error(f"❌ Ошибка при остановке бота: {e}")
     
+    def _schedule_maintenance_jobs(self):
+        """Запуск фоновых задач обслуживания на время работы polling"""
+        self._maintenance_tasks = [
+            asyncio.create_task(cleanup_cache_periodically(interval=300), name="cache_cleanup"),
+            asyncio.create_task(periodic_performance_log(interval=600), name="performance_log"),
+        ]
+        logger.info("⏰ Фоновые задачи обслуживания запланированы")
+    
     async def _handle_update(self, update: Update):
         """Обработка обновления"""
+        # Цикл polling долгоживущий: сбрасываем ID после обработки, иначе
+        # обновление без пользователя унаследует ID предыдущего
+        user_id = str(update.effective_user.id) if update.effective_user else 'anonymous'
+        token = current_user_id.set(user_id)
         try:
             if update.message:
                 await self._handle_message(update.message)
@@ -132,6 +164,8 @@ class AstroBot:
                 await self._handle_callback_query(update.callback_query)
         except Exception as e:
             logger.error(f"❌ Ошибка обработки обновления: {e}")
+        finally:
+            current_user_id.reset(token)
     
     async def _handle_message(self, message):
         """Обработка сообщения"""
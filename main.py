@@ -9,11 +9,13 @@ import signal
 import sys
 from dotenv import load_dotenv
 
+# Загружаем переменные окружения до импорта модулей бота: флаги
+# PERFORMANCE_MONITORING и CACHE_ENABLED читаются при импорте
+load_dotenv()
+
 from bot.telegram_bot_fixed import AstroBot
 from utils.logger import setup_logger
-
-# Загружаем переменные окружения
-load_dotenv()
+from utils.cache import stop_periodic_tasks
 
 # Настраиваем логирование
 logger = setup_logger()
@@ -59,23 +61,30 @@ async def main():
         # Настройка обработчика сигналов для корректной остановки
         def signal_handler():
             logger.info("⏹️ Получен сигнал остановки")
+            stop_periodic_tasks()
             stop_event.set()
         
-        # Регистрируем обработчики сигналов
+        # Регистрируем обработчики сигналов в event loop
         if sys.platform != 'win32':
             loop = asyncio.get_running_loop()
-            loop.add_signal_handler(signal.SIGINT, signal_handler)
-            loop.add_signal_handler(signal.SIGTERM, signal_handler)
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(sig, signal_handler)
         
-        # Запускаем бота
-        await bot.start()
-        logger.info("✅ Астробот успешно запущен!")
+        # Запускаем бота и ждем сигнал остановки: bot.start() крутит polling
+        # до остановки, поэтому гоняем его наперегонки с событием
+        bot_task = asyncio.create_task(bot.start())
+        stop_task = asyncio.create_task(stop_event.wait())
+        done, pending = await asyncio.wait(
+            {bot_task, stop_task},
+            return_when=asyncio.FIRST_COMPLETED
+        )
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
         
-        # Ждем сигнал остановки
-        try:
-            await stop_event.wait()
-        except KeyboardInterrupt:
-            logger.info("⏹️ Получен сигнал остановки (Ctrl+C)")
+        # Пробрасываем ошибку бота, если он завершился аварийно
+        if bot_task in done:
+            bot_task.result()
         
     except Exception as e:
         logger.error(f"❌ Ошибка при запуске бота: {e}")
@@ -88,7 +97,20 @@ async def main():
         logger.info("🛑 Астробот остановлен")
 
 
+def install_uvloop():
+    """Установка uvloop в качестве event loop (если доступен)"""
+    if sys.platform == 'win32':
+        return
+    try:
+        import uvloop
+    except ImportError:
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    logger.info("⚡ Используется uvloop")
+
+
 if __name__ == "__main__":
+    install_uvloop()
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
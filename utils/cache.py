@@ -3,53 +3,78 @@
 Система кэширования для оптимизации производительности
 """
 
+import os
+import sys
 import time
 import json
-from typing import Any, Optional, Dict
+import asyncio
+from typing import Any, Optional, Dict, List, Set, Tuple
 from functools import wraps
 import hashlib
+import heapq
 from utils.logger import setup_logger
 
 logger = setup_logger()
 
+# Выключатель кэширования: при CACHE_ENABLED=false декоратор cached
+# возвращает функцию без обертки
+CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'True').lower() == 'true'
+
+# Маркер промаха кэша: позволяет кэшировать и результат None
+_MISS = object()
+
 
 class CacheManager:
     """Менеджер кэширования"""
     
     def __init__(self, default_ttl: int = 300):  # 5 минут по умолчанию
-        self.cache: Dict[str, Dict[str, Any]] = {}
+        # Запись кэша: (значение, момент истечения)
+        self.cache: Dict[str, Tuple[Any, float]] = {}
         self.default_ttl = default_ttl
+        # Куча (момент истечения, ключ) для подсчета просроченных записей без
+        # обхода всего кэша; записи кучи для перезаписанных и удаленных ключей
+        # отбрасываются при извлечении
+        self._expiry_heap: List[Tuple[float, str]] = []
+        # Ключи, уже извлеченные из кучи как просроченные, но еще лежащие в кэше
+        self._expired_keys: Set[str] = set()
+        # Оценка памяти дорогая, поэтому пересчитываем ее не чаще раза в минуту
+        self._memory_usage = 0
+        self._memory_usage_at = 0.0
+        self._memory_usage_ttl = 60
     
     def _generate_key(self, *args, **kwargs) -> str:
         """Генерация ключа кэша"""
-        key_data = str(args) + str(sorted(kwargs.items()))
+        # kwargs не сортируем: порядок аргументов в месте вызова стабилен, а
+        # другой порядок в худшем случае даст лишний промах, но не неверный ответ
+        key_data = repr(args) + repr(tuple(kwargs.items())) if kwargs else repr(args)
         return hashlib.md5(key_data.encode()).hexdigest()
     
-    def get(self, key: str) -> Optional[Any]:
-        """Получение значения из кэша"""
-        if key not in self.cache:
-            return None
+    def get(self, key: str, default: Any = None) -> Optional[Any]:
+        """Получение значения из кэша (default при промахе)"""
+        cache_item = self.cache.get(key)
+        if cache_item is None:
+            return default
         
-        cache_item = self.cache[key]
+        value, expires_at = cache_item
         
         # Проверяем TTL
-        if time.time() > cache_item['expires_at']:
+        if time.time() > expires_at:
             del self.cache[key]
-            return None
+            self._expired_keys.discard(key)
+            return default
         
         logger.debug(f"📦 Кэш попадание: {key}")
-        return cache_item['value']
+        return value
     
     def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
         """Сохранение значения в кэш"""
         if ttl is None:
             ttl = self.default_ttl
         
-        self.cache[key] = {
-            'value': value,
-            'expires_at': time.time() + ttl,
-            'created_at': time.time()
-        }
+        expires_at = time.time() + ttl
+        self.cache[key] = (value, expires_at)
+        self._expired_keys.discard(key)
+        heapq.heappush(self._expiry_heap, (expires_at, key))
         
         logger.debug(f"💾 Кэш сохранение: {key} (TTL: {ttl}s)")
     
@@ -57,40 +82,62 @@ class CacheManager:
         """Очистка кэша"""
         if pattern is None:
             self.cache.clear()
+            self._expiry_heap.clear()
+            self._expired_keys.clear()
             logger.info("🧹 Весь кэш очищен")
         else:
             keys_to_remove = [key for key in self.cache.keys() if pattern in key]
             for key in keys_to_remove:
                 del self.cache[key]
+                self._expired_keys.discard(key)
             logger.info(f"🧹 Кэш очищен по паттерну: {pattern}")
     
     def cleanup_expired(self) -> None:
         """Очистка просроченных записей"""
         current_time = time.time()
         expired_keys = [
-            key for key, item in self.cache.items()
-            if current_time > item['expires_at']
+            key for key, (_, expires_at) in self.cache.items()
+            if current_time > expires_at
         ]
         
         for key in expired_keys:
             del self.cache[key]
+            self._expired_keys.discard(key)
         
         if expired_keys:
             logger.info(f"🧹 Удалено {len(expired_keys)} просроченных записей из кэша")
     
+    def _estimate_memory_usage(self) -> int:
+        """Приблизительная оценка памяти, занятой кэшем (в байтах)"""
+        current_time = time.time()
+        if current_time - self._memory_usage_at >= self._memory_usage_ttl:
+            self._memory_usage = sum(
+                sys.getsizeof(key) + sys.getsizeof(value)
+                for key, (value, _) in self.cache.items()
+            )
+            self._memory_usage_at = current_time
+        return self._memory_usage
+    
+    def _count_expired(self) -> int:
+        """Число просроченных, но еще не удаленных записей"""
+        current_time = time.time()
+        heap = self._expiry_heap
+        # Извлекаем только истекшие записи кучи: каждая обрабатывается один раз
+        while heap and current_time > heap[0][0]:
+            expires_at, key = heapq.heappop(heap)
+            cache_item = self.cache.get(key)
+            if cache_item is not None and cache_item[1] == expires_at:
+                self._expired_keys.add(key)
+        return len(self._expired_keys)
+    
     def get_stats(self) -> Dict[str, Any]:
         """Получение статистики кэша"""
-        current_time = time.time()
-        active_items = sum(
-            1 for item in self.cache.values()
-            if current_time <= item['expires_at']
-        )
-        
+        expired_items = self._count_expired()
         return {
             'total_items': len(self.cache),
-            'active_items': active_items,
-            'expired_items': len(self.cache) - active_items,
-            'memory_usage': len(str(self.cache))
+            'active_items': len(self.cache) - expired_items,
+            'expired_items': expired_items,
+            'memory_usage': self._estimate_memory_usage()
         }
 
 
@@ -100,18 +147,22 @@ cache_manager = CacheManager()
 
 def cached(ttl: int = 300, key_prefix: str = ""):
     """Декоратор для кэширования результатов функций"""
+    if not CACHE_ENABLED:
+        return lambda func: func
+    
     def decorator(func):
+        prefix = f"{key_prefix}:{func.__name__}:"
+        
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
-            # Генерируем ключ кэша
-            cache_key = f"{key_prefix}:{func.__name__}:{cache_manager._generate_key(*args, **kwargs)}"
+            cache_key = prefix + cache_manager._generate_key(*args, **kwargs)
             
             # Пытаемся получить из кэша
-            cached_result = cache_manager.get(cache_key)
-            if cached_result is not None:
+            cached_result = cache_manager.get(cache_key, _MISS)
+            if cached_result is not _MISS:
                 return cached_result
             
-            # Выполняем функцию и кэшируем результат
+            # Выполняем функцию и кэшируем результат (исключения не кэшируются)
             result = await func(*args, **kwargs)
             cache_manager.set(cache_key, result, ttl)
             
@@ -119,22 +170,20 @@ def cached(ttl: int = 300, key_prefix: str = ""):
         
         @wraps(func)
         def sync_wrapper(*args, **kwargs):
-            # Генерируем ключ кэша
-            cache_key = f"{key_prefix}:{func.__name__}:{cache_manager._generate_key(*args, **kwargs)}"
+            cache_key = prefix + cache_manager._generate_key(*args, **kwargs)
             
             # Пытаемся получить из кэша
-            cached_result = cache_manager.get(cache_key)
-            if cached_result is not None:
+            cached_result = cache_manager.get(cache_key, _MISS)
+            if cached_result is not _MISS:
                 return cached_result
             
-            # Выполняем функцию и кэшируем результат
+            # Выполняем функцию и кэшируем результат (исключения не кэшируются)
             result = func(*args, **kwargs)
             cache_manager.set(cache_key, result, ttl)
             
             return result
         
         # Возвращаем нужную обертку в зависимости от типа функции
-        import asyncio
         if asyncio.iscoroutinefunction(func):
             return async_wrapper
         else:
@@ -158,11 +207,29 @@ def cache_company_data(ttl: int = 3600):  # 1 час для данных ком
     return cached(ttl=ttl, key_prefix="company")
 
 
+# Событие остановки фоновых циклов: ожидание на нем заменяет asyncio.sleep,
+# поэтому циклы завершаются сразу, а не после очередного интервала
+periodic_tasks_shutdown = asyncio.Event()
+
+
+def stop_periodic_tasks() -> None:
+    """Сигнал фоновым циклам завершить работу"""
+    periodic_tasks_shutdown.set()
+
+
+async def wait_for_shutdown(interval: float) -> bool:
+    """Ожидание интервала; True, если за это время поступил сигнал остановки"""
+    try:
+        await asyncio.wait_for(periodic_tasks_shutdown.wait(), timeout=interval)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
 # Функция для периодической очистки кэша
 async def cleanup_cache_periodically(interval: int = 300):
     """Периодическая очистка кэша"""
-    while True:
-        await asyncio.sleep(interval)
+    while not await wait_for_shutdown(interval):
         cache_manager.cleanup_expired()
 
 
@@ -174,5 +241,8 @@ __all__ = [
     'cache_news_data',
     'cache_astro_data',
     'cache_company_data',
+    'periodic_tasks_shutdown',
+    'stop_periodic_tasks',
+    'wait_for_shutdown',
     'cleanup_cache_periodically'
 ]
@@ -3,49 +3,80 @@
 Мониторинг производительности и оптимизация
 """
 
+import os
 import time
+import heapq
 import asyncio
+from contextvars import ContextVar
 from typing import Dict, Any, Callable, Optional
 from functools import wraps
 from utils.logger import setup_logger
-from utils.cache import cache_manager
+from utils.cache import cache_manager, wait_for_shutdown
 
 logger = setup_logger()
 
+# Выключатель мониторинга: при PERFORMANCE_MONITORING=false декоратор
+# возвращает функцию без обертки и не добавляет накладных расходов
+PERF_ENABLED = os.getenv('PERFORMANCE_MONITORING', 'True').lower() == 'true'
+
+
+class FuncMetrics:
+    """Метрики одной функции (слоты вместо словаря)"""
+    
+    __slots__ = ('total_calls', 'total_time', 'cache_hits', 'errors', 'max_time', 'min_time')
+    
+    def __init__(self):
+        self.total_calls = 0
+        self.total_time = 0.0
+        self.cache_hits = 0
+        self.errors = 0
+        self.max_time = 0.0
+        self.min_time = float('inf')
+    
+    @property
+    def avg_time(self) -> float:
+        """Среднее время выполнения"""
+        return self.total_time / self.total_calls if self.total_calls else 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Сериализация метрик в словарь"""
+        data = {slot: getattr(self, slot) for slot in self.__slots__}
+        data['avg_time'] = self.avg_time
+        return data
+
 
 class PerformanceMonitor:
     """Монитор производительности"""
     
     def __init__(self):
-        self.metrics: Dict[str, Dict[str, Any]] = {}
+        self.metrics: Dict[str, FuncMetrics] = {}
         self.start_time = time.time()
+        # Накопительные счетчики, чтобы get_stats не обходил все метрики
+        self._total_calls = 0
+        self._total_time = 0.0
     
     def record_execution_time(self, func_name: str, execution_time: float, 
                             cache_hit: bool = False, error: Optional[str] = None):
         """Запись времени выполнения функции"""
-        if func_name not in self.metrics:
-            self.metrics[func_name] = {
-                'total_calls': 0,
-                'total_time': 0.0,
-                'cache_hits': 0,
-                'errors': 0,
-                'avg_time': 0.0,
-                'max_time': 0.0,
-                'min_time': float('inf')
-            }
+        metrics = self.metrics.get(func_name)
+        if metrics is None:
+            metrics = self.metrics[func_name] = FuncMetrics()
         
-        metrics = self.metrics[func_name]
-        metrics['total_calls'] += 1
-        metrics['total_time'] += execution_time
-        metrics['avg_time'] = metrics['total_time'] / metrics['total_calls']
-        metrics['max_time'] = max(metrics['max_time'], execution_time)
-        metrics['min_time'] = min(metrics['min_time'], execution_time)
+        metrics.total_calls += 1
+        metrics.total_time += execution_time
+        if execution_time > metrics.max_time:
+            metrics.max_time = execution_time
+        if execution_time < metrics.min_time:
+            metrics.min_time = execution_time
+        
+        self._total_calls += 1
+        self._total_time += execution_time
         
         if cache_hit:
-            metrics['cache_hits'] += 1
+            metrics.cache_hits += 1
         
         if error:
-            metrics['errors'] += 1
+            metrics.errors += 1
     
     def get_stats(self) -> Dict[str, Any]:
         """Получение статистики производительности"""
@@ -54,11 +85,11 @@ class PerformanceMonitor:
         
         return {
             'uptime': uptime,
-            'functions': self.metrics,
+            'functions': {name: m.to_dict() for name, m in self.metrics.items()},
             'cache': cache_stats,
             'total_functions': len(self.metrics),
-            'total_calls': sum(m['total_calls'] for m in self.metrics.values()),
-            'avg_response_time': sum(m['avg_time'] for m in self.metrics.values()) / len(self.metrics) if self.metrics else 0
+            'total_calls': self._total_calls,
+            'avg_response_time': self._total_time / self._total_calls if self._total_calls else 0
         }
     
     def log_performance_summary(self):
@@ -76,16 +107,16 @@ class PerformanceMonitor:
         logger.info(f"💾 Кэш: {cache['active_items']}/{cache['total_items']} активных записей")
         
         # Топ медленных функций
-        slow_functions = sorted(
+        slow_functions = heapq.nlargest(
+            3,
             self.metrics.items(),
-            key=lambda x: x[1]['avg_time'],
-            reverse=True
-        )[:3]
+            key=lambda x: x[1].avg_time
+        )
         
         if slow_functions:
             logger.info("🐌 Самые медленные функции:")
             for func_name, metrics in slow_functions:
-                logger.info(f"  • {func_name}: {metrics['avg_time']:.3f}с (вызовов: {metrics['total_calls']})")
+                logger.info(f"  • {func_name}: {metrics.avg_time:.3f}с (вызовов: {metrics.total_calls})")
 
 
 # Глобальный экземпляр монитора
@@ -95,44 +126,44 @@ performance_monitor = PerformanceMonitor()
 def monitor_performance(func_name: Optional[str] = None, log_slow_calls: bool = True, 
                        slow_threshold: float = 1.0):
     """Декоратор для мониторинга производительности"""
+    if not PERF_ENABLED:
+        return lambda func: func
+    
     def decorator(func):
         name = func_name or func.__name__
         cache_hit = False
+        # Локальные ссылки избавляют обертки от поиска глобальных имен на каждом вызове
+        clock = time.perf_counter
+        record = performance_monitor.record_execution_time
         
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
-            nonlocal cache_hit
-            start_time = time.time()
             error = None
-            
+            start_time = clock()
             try:
-                result = await func(*args, **kwargs)
-                return result
+                return await func(*args, **kwargs)
             except Exception as e:
                 error = str(e)
                 raise
             finally:
-                execution_time = time.time() - start_time
-                performance_monitor.record_execution_time(name, execution_time, cache_hit, error)
+                execution_time = clock() - start_time
+                record(name, execution_time, cache_hit, error)
                 
                 if log_slow_calls and execution_time > slow_threshold:
                     logger.warning(f"🐌 Медленный вызов {name}: {execution_time:.3f}с")
         
         @wraps(func)
         def sync_wrapper(*args, **kwargs):
-            nonlocal cache_hit
-            start_time = time.time()
             error = None
-            
+            start_time = clock()
             try:
-                result = func(*args, **kwargs)
-                return result
+                return func(*args, **kwargs)
             except Exception as e:
                 error = str(e)
                 raise
             finally:
-                execution_time = time.time() - start_time
-                performance_monitor.record_execution_time(name, execution_time, cache_hit, error)
+                execution_time = clock() - start_time
+                record(name, execution_time, cache_hit, error)
                 
                 if log_slow_calls and execution_time > slow_threshold:
                     logger.warning(f"🐌 Медленный вызов {name}: {execution_time:.3f}с")
@@ -153,8 +184,7 @@ def log_performance_stats():
 
 async def periodic_performance_log(interval: int = 300):
     """Периодическое логирование статистики производительности"""
-    while True:
-        await asyncio.sleep(interval)
+    while not await wait_for_shutdown(interval):
         log_performance_stats()
 
 
@@ -205,21 +235,17 @@ class RateLimiter:
 rate_limiter = RateLimiter(max_requests=20, time_window=60)  # 20 запросов в минуту
 
 
+# ID пользователя текущего обновления; выставляется диспетчером бота
+current_user_id: ContextVar[str] = ContextVar('current_user_id', default='anonymous')
+
+
 def rate_limit(user_id_key: str = "user_id"):
     """Декоратор для ограничения частоты запросов"""
     def decorator(func):
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
-            # Извлекаем user_id из аргументов
-            user_id = None
-            for arg in args:
-                if hasattr(arg, user_id_key):
-                    user_id = str(getattr(arg, user_id_key))
-                    break
-            
-            if not user_id:
-                # Пытаемся найти в kwargs
-                user_id = str(kwargs.get(user_id_key, 'anonymous'))
+            # Явно переданный user_id имеет приоритет над контекстом обновления
+            user_id = str(kwargs[user_id_key]) if user_id_key in kwargs else current_user_id.get()
             
             if not rate_limiter.is_allowed(user_id):
                 remaining = rate_limiter.get_remaining_requests(user_id)
@@ -230,14 +256,7 @@ def rate_limit(user_id_key: str = "user_id"):
         @wraps(func)
         def sync_wrapper(*args, **kwargs):
             # Аналогично для синхронных функций
-            user_id = None
-            for arg in args:
-                if hasattr(arg, user_id_key):
-                    user_id = str(getattr(arg, user_id_key))
-                    break
-            
-            if not user_id:
-                user_id = str(kwargs.get(user_id_key, 'anonymous'))
+            user_id = str(kwargs[user_id_key]) if user_id_key in kwargs else current_user_id.get()
             
             if not rate_limiter.is_allowed(user_id):
                 remaining = rate_limiter.get_remaining_requests(user_id)
@@ -255,6 +274,7 @@ def rate_limit(user_id_key: str = "user_id"):
 
 # Экспорт основных функций
 __all__ = [
+    'FuncMetrics',
     'PerformanceMonitor',
     'performance_monitor',
     'monitor_performance',
@@ -262,5 +282,6 @@ __all__ = [
     'periodic_performance_log',
     'RateLimiter',
     'rate_limiter',
+    'current_user_id',
     'rate_limit'
 ]
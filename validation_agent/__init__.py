@@ -2,10 +2,28 @@
 Модуль валидации ответов AI
 """
 
-from .metrics_loader import load_scoring_profile
-from .section_parser import split_sections, word_count, has_markdown_or_html
-from .scorecard import compute_score
-from .orchestrator import PromptOrchestrator
+import importlib
+
+# Подмодули загружаются лениво (PEP 562), при первом обращении к имени,
+# чтобы импорт validation_agent.validator не тянул yaml и скоринг
+_EXPORTS = {
+    'load_scoring_profile': 'metrics_loader',
+    'split_sections': 'section_parser',
+    'word_count': 'section_parser',
+    'has_markdown_or_html': 'section_parser',
+    'compute_score': 'scorecard',
+    'PromptOrchestrator': 'orchestrator',
+}
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
 
 __all__ = [
     'load_scoring_profile',
@@ -14,4 +32,4 @@ __all__ = [
     'has_markdown_or_html',
     'compute_score',
     'PromptOrchestrator'
-]
\ No newline at end of file
+]
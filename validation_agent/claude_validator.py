@@ -3,45 +3,22 @@
 """
 
 import os
+import re
+import asyncio
+import hashlib
 import aiohttp
-import json
-import traceback
-from typing import Dict, Any, List, Tuple
+from collections import OrderedDict
+from typing import Dict, Any, List, Tuple, Optional
 from utils.logger import setup_logger
 
 logger = setup_logger()
 
+# Числовая оценка в ответе Claude (например "8.5" или "8,5")
+_SCORE_RE = re.compile(r'(\d+(?:[.,]\d+)?)')
 
-class ClaudeValidatorAgent:
-    """Продвинутый валидатор на Claude-3.5-Sonnet"""
-    
-    def __init__(self):
-        """Инициализация Claude валидатора"""
-        self.api_key = os.getenv('ANTHROPIC_API_KEY')
-        self.model = "claude-3-5-sonnet-20241022"
-        self.api_url = "https://api.anthropic.com/v1/messages"
-        self.max_tokens = 2000
-        
-        if self.api_key:
-            logger.info("✅ Claude валидатор инициализирован")
-        else:
-            logger.warning("⚠️ ANTHROPIC_API_KEY не найден в .env")
-    
-    async def validate_and_score(self, text: str, original_prompt: str, analysis_type: str = "zodiac") -> Dict[str, Any]:
-        """
-        Валидация и оценка текста через Claude
-        """
-        if not self.api_key:
-            return {
-                'score': 5.0,
-                'is_valid': False,
-                'issues': ['API ключ не настроен'],
-                'suggestions': [],
-                'fixed_text': text
-            }
-        
-        validation_prompt = f"""
-Ты - строгий валидатор текстов для Telegram бота. Оцени этот астрологический анализ от 1 до 10.
+# Статичные инструкции вынесены в system-блоки с cache_control: Anthropic
+# кэширует этот префикс, и повторные итерации не оплачивают его заново
+VALIDATION_SYSTEM_PROMPT = """Ты - строгий валидатор текстов для Telegram бота. Оцени этот астрологический анализ от 1 до 10.
 
 КРИТЕРИИ ОЦЕНКИ:
 
@@ -66,104 +43,9 @@ class ClaudeValidatorAgent:
 - Профессиональный тон = +2 балла
 
 ВЕРНИ ТОЛЬКО ЧИСЛО ОТ 1 ДО 10. Например: 8.5
-
-ТЕКСТ ДЛЯ ОЦЕНКИ:
-{text}
 """
-        
-        try:
-            async with aiohttp.ClientSession() as session:
-                headers = {
-                    'x-api-key': self.api_key,
-                    'content-type': 'application/json',
-                    'anthropic-version': '2023-06-01'
-                }
-                
-                payload = {
-                    'model': self.model,
-                    'max_tokens': 100,
-                    'messages': [
-                        {
-                            'role': 'user',
-                            'content': validation_prompt
-                        }
-                    ]
-                }
-                
-                async with session.post(self.api_url, headers=headers, json=payload) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        content = result['content'][0]['text'].strip()
-                        
-                        try:
-                            # Извлекаем число оценки из ответа
-                            import re
-                            
-                            # Ищем числовую оценку в тексте
-                            number_pattern = r'(\d+(?:[.,]\d+)?)'
-                            matches = re.findall(number_pattern, content)
-                            
-                            if matches:
-                                # Берем первое найденное число
-                                score_text = matches[0].replace(',', '.')
-                                score = float(score_text)
-                                
-                                # Ограничиваем диапазон 1-10
-                                score = max(1.0, min(10.0, score))
-                            else:
-                                # Если число не найдено, используем дефолтное значение
-                                logger.warning("⚠️ Не найдено числовой оценки в ответе Claude")
-                                score = 7.0
-                            
-                            logger.info(f"✅ Claude валидация завершена: оценка {score}/10")
-                            
-                            return {
-                                'score': score,
-                                'is_valid': score >= 7.0,
-                                'confidence': 0.9,
-                                'issues': [],
-                                'suggestions': []
-                            }
-                            
-                        except Exception as e:
-                            logger.warning("⚠️ Ошибка парсинга оценки Claude: %s", str(e))
-                            logger.warning("Ответ Claude: %s", content[:200])
-                            # Возвращаем дефолтную оценку при ошибке
-                            return {
-                                'score': 7.0,
-                                'is_valid': True,
-                                'confidence': 0.5,
-                                'issues': [f"Ошибка парсинга: {str(e)}"],
-                                'suggestions': []
-                            }
-                    else:
-                        logger.warning("⚠️ Claude API ошибка: %s", response.status)
-                        
-        except Exception as e:
-            logger.warning("⚠️ Ошибка Claude валидации: %s", str(e))
-        
-        # Возвращаем дефолтный результат при ошибке
-        return {
-            'score': 5.0,
-            'is_valid': False,
-            'issues': ['Ошибка API валидации'],
-            'suggestions': [],
-            'confidence': 0.0
-        }
-    
-    async def fix_text_with_claude(self, text: str, target_score: float = 10.0, current_score: float = 5.0) -> str:
-        """Исправление текста через Claude"""
-        if not self.api_key:
-            return text
-        
-        fix_prompt = f"""
-ИСПРАВЬ следующий текст ДО ДОСТИЖЕНИЯ ОЦЕНКИ 10.0/10 согласно ВСЕМ строгим требованиям из промптов.
 
-ТЕКУЩАЯ ОЦЕНКА: {current_score}/10
-ЦЕЛЬ: ТОЧНО 10.0/10
-
-ТЕКСТ ДЛЯ ИСПРАВЛЕНИЯ:
-{text}
+FIX_SYSTEM_PROMPT = """ИСПРАВЬ присланный текст ДО ДОСТИЖЕНИЯ ОЦЕНКИ 10.0/10 согласно ВСЕМ строгим требованиям из промптов.
 
 СТРОГИЕ ТРЕБОВАНИЯ ИЗ ПРОМПТА (КАЖДОЕ НАРУШЕНИЕ СНИЖАЕТ ОЦЕНКУ):
 
@@ -215,35 +97,226 @@ class ClaudeValidatorAgent:
 
 Верни ТОЛЬКО исправленный текст без комментариев.
 """
+
+
+def _cached_system(prompt: str) -> List[Dict[str, Any]]:
+    """System-блок, помеченный для кэширования промпта"""
+    return [{'type': 'text', 'text': prompt, 'cache_control': {'type': 'ephemeral'}}]
+
+
+def _copy_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Копия результата оценки вместе со списками внутри"""
+    return {key: list(value) if isinstance(value, list) else value for key, value in result.items()}
+
+
+class ClaudeValidatorAgent:
+    """Продвинутый валидатор на Claude-3.5-Sonnet"""
+    
+    def __init__(self):
+        """Инициализация Claude валидатора"""
+        self.api_key = os.getenv('ANTHROPIC_API_KEY')
+        self.model = "claude-3-5-sonnet-20241022"
+        # Для оценки (вернуть одно число) достаточно быстрой и дешевой Haiku;
+        # Sonnet остается для исправления текста
+        self.validator_model = os.getenv('CLAUDE_VALIDATOR_MODEL', 'claude-3-5-haiku-20241022')
+        self.api_url = "https://api.anthropic.com/v1/messages"
+        self.max_tokens = 2000
+        self.max_retries = 3
+        # Общая сессия с keep-alive: не открываем TLS-соединение на каждый запрос
+        self._session: Optional[aiohttp.ClientSession] = None
+        # LRU-кэш оценок: повторная оценка того же текста не идет в API
+        self._score_cache: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._score_cache_size = 128
         
-        try:
-            async with aiohttp.ClientSession() as session:
-                headers = {
+        if self.api_key:
+            logger.info("✅ Claude валидатор инициализирован")
+        else:
+            logger.warning("⚠️ ANTHROPIC_API_KEY не найден в .env")
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Ленивое создание общей HTTP-сессии для запросов к Claude"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=16, ttl_dns_cache=300, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=60),
+                headers={
                     'x-api-key': self.api_key,
                     'content-type': 'application/json',
                     'anthropic-version': '2023-06-01'
                 }
+            )
+        return self._session
+    
+    async def aclose(self):
+        """Закрытие HTTP-сессии"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def _post_messages(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        POST в Messages API с повтором при перегрузке (429/529)
+        
+        Returns:
+            Optional[Dict]: JSON ответа или None при ошибке API
+        """
+        session = await self._get_session()
+        for attempt in range(self.max_retries):
+            async with session.post(self.api_url, json=payload) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    self._log_cache_usage(result)
+                    return result
                 
-                payload = {
-                    'model': self.model,
-                    'max_tokens': self.max_tokens,
-                    'messages': [
-                        {
-                            'role': 'user',
-                            'content': fix_prompt
-                        }
-                    ]
+                if response.status in (429, 529) and attempt + 1 < self.max_retries:
+                    retry_after = response.headers.get('retry-after', '1')
+                    try:
+                        delay = float(retry_after)
+                    except ValueError:
+                        delay = 1.0
+                    delay *= 2 ** attempt
+                    logger.warning(
+                        f"⚠️ Claude API перегружен ({response.status}, retry-after={retry_after}), "
+                        f"повтор через {delay:.1f}с"
+                    )
+                else:
+                    logger.warning("⚠️ Claude API ошибка: %s", response.status)
+                    return None
+            await asyncio.sleep(delay)
+        return None
+    
+    def _log_cache_usage(self, result: Dict[str, Any]):
+        """Отладочный лог использования кэша промпта"""
+        usage = result.get('usage', {})
+        logger.debug(
+            f"💾 Кэш промпта Claude: прочитано {usage.get('cache_read_input_tokens', 0)}, "
+            f"записано {usage.get('cache_creation_input_tokens', 0)} токенов"
+        )
+    
+    async def validate_and_score(self, text: str, original_prompt: str, analysis_type: str = "zodiac") -> Dict[str, Any]:
+        """
+        Валидация и оценка текста через Claude
+        """
+        if not self.api_key:
+            return {
+                'score': 5.0,
+                'is_valid': False,
+                'issues': ['API ключ не настроен'],
+                'suggestions': [],
+                'fixed_text': text
+            }
+        
+        cache_key = hashlib.sha256((analysis_type + "\x00" + text).encode()).hexdigest()
+        cached_result = self._score_cache.get(cache_key)
+        if cached_result is not None:
+            self._score_cache.move_to_end(cache_key)
+            logger.info(f"📦 Оценка Claude из кэша: {cached_result['score']}/10")
+            return _copy_result(cached_result)
+        
+        user_message = f"ТЕКСТ ДЛЯ ОЦЕНКИ:\n{text}"
+        
+        payload = {
+            'model': self.validator_model,
+            # ожидаем одно число: короткого вывода хватает, лишнее отсекает _SCORE_RE
+            'max_tokens': 16,
+            'system': _cached_system(VALIDATION_SYSTEM_PROMPT),
+            'messages': [
+                {
+                    'role': 'user',
+                    'content': user_message
                 }
+            ]
+        }
+        
+        try:
+            result = await self._post_messages(payload)
+            if result is not None:
+                content = result['content'][0]['text'].strip()
                 
-                async with session.post(self.api_url, headers=headers, json=payload) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        fixed_text = result['content'][0]['text'].strip()
-                        logger.info("✅ Текст исправлен через Claude")
-                        return fixed_text
-                    else:
-                        logger.warning("⚠️ Claude исправление недоступно: %s", response.status)
+                try:
+                    # Извлекаем первое число оценки из ответа
+                    match = _SCORE_RE.search(content)
+                    
+                    if match:
+                        score = float(match.group(1).replace(',', '.'))
                         
+                        # Ограничиваем диапазон 1-10
+                        score = max(1.0, min(10.0, score))
+                    else:
+                        # Если число не найдено, используем дефолтное значение
+                        logger.warning("⚠️ Не найдено числовой оценки в ответе Claude")
+                        score = 7.0
+                    
+                    logger.info(f"✅ Claude валидация завершена: оценка {score}/10")
+                    
+                    validation_result = {
+                        'score': score,
+                        'is_valid': score >= 7.0,
+                        'confidence': 0.9,
+                        'issues': [],
+                        'suggestions': []
+                    }
+                    # В кэше своя копия: изменения результата вызывающим кодом ее не затронут
+                    self._score_cache[cache_key] = _copy_result(validation_result)
+                    if len(self._score_cache) > self._score_cache_size:
+                        self._score_cache.popitem(last=False)
+                    return validation_result
+                    
+                except Exception as e:
+                    logger.warning("⚠️ Ошибка парсинга оценки Claude: %s", str(e))
+                    logger.warning("Ответ Claude: %s", content[:200])
+                    # Возвращаем дефолтную оценку при ошибке
+                    return {
+                        'score': 7.0,
+                        'is_valid': True,
+                        'confidence': 0.5,
+                        'issues': [f"Ошибка парсинга: {str(e)}"],
+                        'suggestions': []
+                    }
+                    
+        except Exception as e:
+            logger.warning("⚠️ Ошибка Claude валидации: %s", str(e))
+        
+        # Возвращаем дефолтный результат при ошибке
+        return {
+            'score': 5.0,
+            'is_valid': False,
+            'issues': ['Ошибка API валидации'],
+            'suggestions': [],
+            'confidence': 0.0
+        }
+    
+    async def fix_text_with_claude(self, text: str, target_score: float = 10.0, current_score: float = 5.0) -> str:
+        """Исправление текста через Claude"""
+        if not self.api_key:
+            return text
+        
+        user_message = (
+            f"ТЕКУЩАЯ ОЦЕНКА: {current_score}/10\n"
+            f"ЦЕЛЬ: ТОЧНО 10.0/10\n\n"
+            f"ТЕКСТ ДЛЯ ИСПРАВЛЕНИЯ:\n{text}"
+        )
+        
+        payload = {
+            'model': self.model,
+            'max_tokens': self.max_tokens,
+            'system': _cached_system(FIX_SYSTEM_PROMPT),
+            'messages': [
+                {
+                    'role': 'user',
+                    'content': user_message
+                }
+            ]
+        }
+        
+        try:
+            result = await self._post_messages(payload)
+            if result is not None:
+                fixed_text = result['content'][0]['text'].strip()
+                logger.info("✅ Текст исправлен через Claude")
+                return fixed_text
+            logger.warning("⚠️ Claude исправление недоступно")
+                    
         except Exception as e:
             logger.warning("⚠️ Ошибка исправления через Claude: %s", str(e))
         
@@ -259,75 +332,125 @@ class ClaudeValidatorAgent:
         """
         current_text = text
         iteration = 0
+        previous_score: Optional[float] = None
+        stagnant_iterations = 0
+        last_validated_text: Optional[str] = None
+        last_ui_score: Optional[float] = None
+        pending_ui: List[asyncio.Task] = []
         
         logger.info(f"🎯 НАЧИНАЕМ ИТЕРАТИВНОЕ УЛУЧШЕНИЕ ДО ОЦЕНКИ {target_score}/10")
         logger.info("📊 ОСНОВНОЙ АГЕНТ БУДЕТ СТРЕМИТЬСЯ К МАКСИМАЛЬНОЙ ОЦЕНКЕ")
         
-        while iteration < max_iterations:
-            iteration += 1
-            logger.info("=" * 60)
-            logger.info(f"🔄 ИТЕРАЦИЯ УЛУЧШЕНИЯ #{iteration} из {max_iterations}")
-            logger.info(f"🎯 ЦЕЛЬ: достичь оценки {target_score}/10")
-            
-            # Получаем оценку от Claude
-            validation_result = await self.validate_and_score(current_text, original_prompt, analysis_type)
-            current_score = validation_result.get('score', 5.0)
-            
-            # ДЕТАЛЬНОЕ ЛОГИРОВАНИЕ ОЦЕНКИ
-            logger.info(f"📊 ТЕКУЩАЯ ОЦЕНКА: {current_score}/10")
-            
-            # Отправляем обновление пользователю если есть callback
-            if update_callback:
-                try:
-                    await update_callback(f"🔍 **Улучшение качества текста...**\n\n"
-                                        f"⏳ Итерация {iteration}/{max_iterations}\n"
-                                        f"🔄 Обрабатываем...")
-                except:
-                    pass  # Игнорируем ошибки обновления UI
+        try:
+            while iteration < max_iterations:
+                iteration += 1
+                logger.info("=" * 60)
+                logger.info(f"🔄 ИТЕРАЦИЯ УЛУЧШЕНИЯ #{iteration} из {max_iterations}")
+                logger.info(f"🎯 ЦЕЛЬ: достичь оценки {target_score}/10")
+                
+                # При пограничной оценке исправление почти наверняка понадобится:
+                # запускаем его спекулятивно, параллельно с оценкой текущего текста
+                fix_task = None
+                if previous_score is not None and previous_score >= 7.0:
+                    fix_task = asyncio.create_task(
+                        self.fix_text_with_claude(current_text, target_score, previous_score)
+                    )
+                
+                # Получаем оценку от Claude
+                validation_result = await self.validate_and_score(current_text, original_prompt, analysis_type)
+                current_score = validation_result.get('score', 5.0)
+                if previous_score is not None and current_score <= previous_score + 0.1:
+                    stagnant_iterations += 1
+                else:
+                    stagnant_iterations = 0
+                previous_score = current_score
+                last_validated_text = current_text
+                
+                # ДЕТАЛЬНОЕ ЛОГИРОВАНИЕ ОЦЕНКИ
+                logger.info(f"📊 ТЕКУЩАЯ ОЦЕНКА: {current_score}/10")
+                
+                # Отправляем обновление пользователю в фоне и не на каждой итерации:
+                # правки сообщений Telegram лимитированы и не должны тормозить Claude
+                if update_callback and (
+                    iteration % 2 == 1 or last_ui_score is None or abs(current_score - last_ui_score) >= 0.5
+                ):
+                    last_ui_score = current_score
+                    pending_ui.append(asyncio.create_task(update_callback(
+                        f"🔍 **Улучшение качества текста...**\n\n"
+                        f"⏳ Итерация {iteration}/{max_iterations}\n"
+                        f"🔄 Обрабатываем..."
+                    )))
+                
+                # ПРОВЕРЯЕМ ДОСТИЖЕНИЕ ЦЕЛИ
+                if current_score >= target_score:
+                    logger.info(f"🎉 ЦЕЛЬ ДОСТИГНУТА! Оценка {current_score}/10 за {iteration} итераций")
+                    logger.info("🏆 ОСНОВНОЙ АГЕНТ УСПЕШНО ДОСТИГ МАКСИМАЛЬНОГО КАЧЕСТВА!")
+                    if fix_task is not None:
+                        fix_task.cancel()
+                        await asyncio.gather(fix_task, return_exceptions=True)
+                    return current_text, current_score
+                
+                # Оценка не растет две итерации подряд - дальнейшие вызовы Claude бесполезны
+                if stagnant_iterations >= 2:
+                    logger.info(f"📉 Оценка перестала расти ({current_score}/10) - завершаем итерации досрочно")
+                    if fix_task is not None:
+                        fix_task.cancel()
+                        await asyncio.gather(fix_task, return_exceptions=True)
+                    return current_text, current_score
+                
+                if current_score >= 7.0:
+                    logger.info(f"✅ Минимальный порог пройден: {current_score}/10, но продолжаем к цели {target_score}")
+                else:
+                    logger.warning(f"⚠️ Оценка {current_score}/10 ниже минимума 7.0 - ОСНОВНОЙ АГЕНТ ДОЛЖЕН УЛУЧШИТЬ ТЕКСТ")
+                
+                # УЛУЧШАЕМ ТЕКСТ
+                logger.info("🔧 ОСНОВНОЙ АГЕНТ ПРИМЕНЯЕТ УЛУЧШЕНИЯ...")
+                if fix_task is not None:
+                    improved_text = await fix_task
+                else:
+                    improved_text = await self.fix_text_with_claude(current_text, target_score, current_score)
+                
+                if improved_text == current_text:
+                    logger.info("ℹ️ Claude вернул текст без изменений - завершаем итерации")
+                    break
+                
+                if improved_text and len(improved_text.strip()) > 100:
+                    if len(improved_text) < len(current_text) * 0.7:
+                        logger.warning(f"⚠️ Текст сократился с {len(current_text)} до {len(improved_text)} символов - отклоняем")
+                        break
+                    
+                    current_text = improved_text
+                    logger.info(f"✅ ОСНОВНОЙ АГЕНТ УЛУЧШИЛ ТЕКСТ ({len(current_text)} символов)")
+                    logger.info(f"🔄 ПЕРЕХОДИМ К СЛЕДУЮЩЕЙ ИТЕРАЦИИ ДЛЯ ДОСТИЖЕНИЯ ЦЕЛИ {target_score}/10")
+                else:
+                    logger.warning("⚠️ ОСНОВНОЙ АГЕНТ НЕ СМОГ УЛУЧШИТЬ ТЕКСТ - завершаем итерации")
+                    break
             
-            # ПРОВЕРЯЕМ ДОСТИЖЕНИЕ ЦЕЛИ
-            if current_score >= target_score:
-                logger.info(f"🎉 ЦЕЛЬ ДОСТИГНУТА! Оценка {current_score}/10 за {iteration} итераций")
-                logger.info("🏆 ОСНОВНОЙ АГЕНТ УСПЕШНО ДОСТИГ МАКСИМАЛЬНОГО КАЧЕСТВА!")
-                return current_text, current_score
-            elif current_score >= 7.0:
-                logger.info(f"✅ Минимальный порог пройден: {current_score}/10, но продолжаем к цели {target_score}")
+            logger.warning(f"⚠️ ДОСТИГНУТО МАКСИМУМ ИТЕРАЦИЙ ({max_iterations})")
+            if current_text is last_validated_text:
+                # Текст не менялся после последней оценки - повторный запрос не нужен
+                final_score = previous_score
             else:
-                logger.warning(f"⚠️ Оценка {current_score}/10 ниже минимума 7.0 - ОСНОВНОЙ АГЕНТ ДОЛЖЕН УЛУЧШИТЬ ТЕКСТ")
-            
-            # УЛУЧШАЕМ ТЕКСТ
-            logger.info("🔧 ОСНОВНОЙ АГЕНТ ПРИМЕНЯЕТ УЛУЧШЕНИЯ...")
-            improved_text = await self.fix_text_with_claude(current_text, target_score, current_score)
+                logger.info("🔍 ФИНАЛЬНАЯ ПРОВЕРКА КАЧЕСТВА...")
+                final_result = await self.validate_and_score(current_text, original_prompt, analysis_type)
+                final_score = final_result.get('score', 5.0)
             
-            if improved_text and len(improved_text.strip()) > 100:
-                if len(improved_text) < len(current_text) * 0.7:
-                    logger.warning(f"⚠️ Текст сократился с {len(current_text)} до {len(improved_text)} символов - отклоняем")
-                    break
-                
-                current_text = improved_text
-                logger.info(f"✅ ОСНОВНОЙ АГЕНТ УЛУЧШИЛ ТЕКСТ ({len(current_text)} символов)")
-                logger.info(f"🔄 ПЕРЕХОДИМ К СЛЕДУЮЩЕЙ ИТЕРАЦИИ ДЛЯ ДОСТИЖЕНИЯ ЦЕЛИ {target_score}/10")
+            logger.info("=" * 60)
+            logger.info("🏁 ИТОГОВЫЙ РЕЗУЛЬТАТ:")
+            logger.info(f"📊 ФИНАЛЬНАЯ ОЦЕНКА: {final_score}/10")
+            if final_score >= target_score:
+                logger.info(f"🎉 ОСНОВНОЙ АГЕНТ ДОСТИГ ЦЕЛИ {target_score}/10!")
+            elif final_score >= 7.0:
+                logger.info(f"✅ Минимальный порог пройден, но цель {target_score} не достигнута")
             else:
-                logger.warning("⚠️ ОСНОВНОЙ АГЕНТ НЕ СМОГ УЛУЧШИТЬ ТЕКСТ - завершаем итерации")
-                break
-        
-        logger.warning(f"⚠️ ДОСТИГНУТО МАКСИМУМ ИТЕРАЦИЙ ({max_iterations})")
-        logger.info("🔍 ФИНАЛЬНАЯ ПРОВЕРКА КАЧЕСТВА...")
-        final_result = await self.validate_and_score(current_text, original_prompt, analysis_type)
-        final_score = final_result.get('score', 5.0)
-        
-        logger.info("=" * 60)
-        logger.info("🏁 ИТОГОВЫЙ РЕЗУЛЬТАТ:")
-        logger.info(f"📊 ФИНАЛЬНАЯ ОЦЕНКА: {final_score}/10")
-        if final_score >= target_score:
-            logger.info(f"🎉 ОСНОВНОЙ АГЕНТ ДОСТИГ ЦЕЛИ {target_score}/10!")
-        elif final_score >= 7.0:
-            logger.info(f"✅ Минимальный порог пройден, но цель {target_score} не достигнута")
-        else:
-            logger.warning(f"❌ Оценка {final_score} ниже минимума 7.0")
-        logger.info("=" * 60)
-        
-        return current_text, final_score
+                logger.warning(f"❌ Оценка {final_score} ниже минимума 7.0")
+            logger.info("=" * 60)
+            
+            return current_text, final_score
+        finally:
+            # Дожидаемся фоновых обновлений UI (ошибки UI игнорируются)
+            if pending_ui:
+                await asyncio.gather(*pending_ui, return_exceptions=True)
 
 
 class AnthropicValidationAgent:
@@ -338,6 +461,10 @@ class AnthropicValidationAgent:
         self.claude_validator = ClaudeValidatorAgent()
         logger.info("✅ Anthropic валидатор инициализирован")
     
+    async def aclose(self):
+        """Освобождение сетевых ресурсов валидатора"""
+        await self.claude_validator.aclose()
+    
     async def validate_and_fix(self, text: str, analysis_type: str = "zodiac", original_prompt: str = "") -> str:
         """
         Основной метод валидации и исправления
@@ -1,11 +1,35 @@
 # -*- coding: utf-8 -*-
 import yaml
+from functools import lru_cache
 from pathlib import Path
 
+# C-загрузчик libyaml заметно быстрее, если PyYAML собран с ним
+_YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+@lru_cache(maxsize=8)
+def _load_yaml(path_str: str) -> dict:
+    # файл метрик статичен в рамках процесса: читаем и разбираем его один раз
+    return yaml.load(Path(path_str).read_text(encoding="utf-8"), Loader=_YamlLoader)
+
+def section_specs(prof: dict) -> tuple:
+    # (title, presence, quality) по каждой секции — без dict.get в цикле оценки
+    return tuple(
+        (s["title"], float(s.get("presence", 0.0)), float(s.get("quality", 0.0)))
+        for s in prof["sections"]
+    )
+
+@lru_cache(maxsize=32)
+def _cached_section_specs(path_str: str, profile_name: str) -> tuple:
+    return section_specs(_load_yaml(path_str)["profiles"][profile_name])
+
 def load_scoring_profile(profile_name: str, base_path: Path = None) -> dict:
     base = base_path or Path(__file__).resolve().parents[1] / "configs" / "scoring.yaml"
-    data = yaml.safe_load(base.read_text(encoding="utf-8"))
+    data = _load_yaml(str(base))
     prof = data.get("profiles", {}).get(profile_name)
     if not prof:
         raise ValueError(f"Scoring profile not found: {profile_name}")
-    return {"global": data.get("global", {}), "profile": prof}
+    return {
+        "global": data.get("global", {}),
+        "profile": prof,
+        "section_specs": _cached_section_specs(str(base), profile_name)
+    }
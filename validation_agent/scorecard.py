@@ -1,13 +1,21 @@
 # -*- coding: utf-8 -*-
 from typing import Dict, List
 from .section_parser import split_sections, word_count, has_markdown_or_html
+from .metrics_loader import section_specs
+
+# ключевые слова эвристик (в нижнем регистре; "контрагент" покрывает и "контрагентом")
+STATUS_WORDS = ("сотрудник", "партнер", "контрагент")
+TONE_BAD = ("эээ", "ну", "типа")
+NEWS_KEYS = ("Политика:", "Экономика:", "Фондовый рынок:")
 
 def compute_score(text: str, profile: dict) -> Dict:
     prof = profile["profile"]
     glob = profile["global"]
     min_words = prof.get("min_words_per_section", 0)
-    sections_cfg = prof["sections"]
-    expected_titles = [x["title"] for x in sections_cfg]
+    # профили из load_scoring_profile уже несут предвычисленные секции
+    specs = profile.get("section_specs") or section_specs(prof)
+    expected_titles = [title for title, _, _ in specs]
+    lower = text.lower()
 
     # формат
     critical_broken = has_markdown_or_html(text)
@@ -17,39 +25,37 @@ def compute_score(text: str, profile: dict) -> Dict:
     breakdown = []
 
     # секции: присутствие и качество
-    for sec in sections_cfg:
-        title = sec["title"]
-        presence = sec.get("presence", 0.0)
-        quality = sec.get("quality", 0.0)
+    for title, presence, quality in specs:
         body = sections_found.get(title, "")
+        words = word_count(body) if body else 0
         present_ok = 1.0 if body else 0.0
-        quality_ok = 1.0 if (body and word_count(body) >= min_words) else 0.0
+        quality_ok = 1.0 if (body and words >= min_words) else 0.0
         pts = presence * present_ok + quality * quality_ok
         score += pts
         breakdown.append({
             "section": title,
             "present": bool(present_ok),
             "quality_ok": bool(quality_ok),
-            "words": word_count(body) if body else 0,
+            "words": words,
             "points": pts
         })
 
     # extra критерии
     extra_pts = 0.0
     extras = prof.get("extra", {})
-    if extras.get("known_companies") and "🏢" in "".join(sections_found.keys()):
+    if extras.get("known_companies") and any("🏢" in title for title in sections_found):
         extra_pts += extras["known_companies"]
     if extras.get("industry_binding"):
         # эвристика: в тексте встречается слово "отрасл" или упоминание конкретной отрасли от бизнес-контекста
-        if "отрасл" in text.lower():
+        if "отрасл" in lower:
             extra_pts += extras["industry_binding"]
     if extras.get("status_binding"):
         # для совместимости: ищем ключевые слова статуса
-        if any(w in text.lower() for w in ["сотрудник", "партнер", "контрагент", "контрагентом"]):
+        if any(w in lower for w in STATUS_WORDS):
             extra_pts += extras["status_binding"]
     if extras.get("news_2_2_2"):
         # примитивная проверка: найдены три блока "Политика", "Экономика", "Фондовый рынок"
-        key_ok = all(k in text for k in ["Политика:", "Экономика:", "Фондовый рынок:"])
+        key_ok = all(k in text for k in NEWS_KEYS)
         if key_ok:
             extra_pts += extras["news_2_2_2"]
 
@@ -64,11 +70,11 @@ def compute_score(text: str, profile: dict) -> Dict:
         global_pts += fmt_points
     if tone_points:
         # упрощённо: если нет просторечных оборотов — даём очки (эвристика)
-        if not any(w in text.lower() for w in ["эээ", "ну", "типа"]):
+        if not any(w in lower for w in TONE_BAD):
             global_pts += tone_points
 
     # критический критерий
-    if glob.get("no_markdown_html", {}).get("critical", False) and has_markdown_or_html(text):
+    if glob.get("no_markdown_html", {}).get("critical", False) and critical_broken:
         # критический провал — можно жёстко занулить
         final = max(0.0, score + global_pts - 5.0)
         return {
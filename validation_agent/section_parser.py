@@ -1,29 +1,35 @@
 # -*- coding: utf-8 -*-
 import re
-from typing import Dict, List
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+@lru_cache(maxsize=32)
+def _title_pattern(titles: Tuple[str, ...]) -> "re.Pattern[str]":
+    # строка целиком (без учета пробелов по краям) совпадает с одним из заголовков
+    alternation = "|".join(re.escape(t) for t in titles)
+    return re.compile(r"^[^\S\n]*(" + alternation + r")[^\S\n]*$", re.MULTILINE)
 
 def split_sections(text: str, expected_titles: List[str]) -> Dict[str, str]:
     # режем по точному совпадению строки заголовка
-    sections, current, buf = {}, None, []
-    lines = text.splitlines()
-    titles = set(t.strip() for t in expected_titles)
-    for ln in lines:
-        if ln.strip() in titles:
-            if current:
-                sections[current] = "\n".join(buf).strip()
-                buf = []
-            current = ln.strip()
-        else:
-            if current:
-                buf.append(ln)
-    if current:
-        sections[current] = "\n".join(buf).strip()
+    titles = tuple(sorted(set(t.strip() for t in expected_titles) - {""}))
+    if not titles:
+        return {}
+    matches = list(_title_pattern(titles).finditer(text))
+    sections = {}
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        sections[m.group(1)] = text[m.end():end].strip()
     return sections
 
 def word_count(s: str) -> int:
-    return len(re.findall(r"\w+", s, flags=re.UNICODE))
+    # порог слов в секции — эвристика, разбиения по пробелам достаточно
+    return len(s.split())
+
+_MD_CHARS = frozenset("#*_`")
+_HTML_RE = re.compile(r"<[^>]+>")
 
 def has_markdown_or_html(s: str) -> bool:
-    if re.search(r"[#*_`]{1,}", s): return True
-    if re.search(r"<[^>]+>", s): return True
+    # любой из символов разметки уже означает Markdown, регэксп для этого не нужен
+    if not _MD_CHARS.isdisjoint(s): return True
+    if "<" in s and _HTML_RE.search(s): return True
     return False
@@ -4,7 +4,13 @@
 
 import re
 import json
+import asyncio
+import hashlib
+import threading
+from itertools import islice
+from bisect import bisect_left
 import traceback
+from collections import OrderedDict
 from typing import Dict, Any, List, Tuple, Optional
 from utils.logger import setup_logger
 
@@ -15,10 +21,14 @@ def _safe_json(obj) -> str:
     """Безопасно сериализует любой объект для лога, не роняя логгер."""
     try:
         if isinstance(obj, str):
-            # попытка вытащить JSON из «грязной» строки и красиво отформатировать
+            # попытка вытащить JSON из «грязной» строки и красиво отформатировать;
+            # парсер запускаем, только если строка похожа на объект с ключами
             obj_str = obj.strip()
-            if obj_str.startswith("{") and obj_str.endswith("}"):
-                return json.dumps(json.loads(obj_str), ensure_ascii=False, indent=2)
+            if len(obj_str) > 8 and obj_str[0] == "{" and obj_str[-1] == "}" and '":' in obj_str:
+                try:
+                    return json.dumps(json.loads(obj_str), ensure_ascii=False, indent=2)
+                except ValueError:
+                    pass
             return obj
         return json.dumps(obj, ensure_ascii=False, indent=2)
     except Exception:
@@ -29,213 +39,401 @@ def _safe_json(obj) -> str:
 
 def log_kv(level: str, msg: str, payload=None):
     """Лог с безопасной подстановкой. Никаких f-строк/format/%."""
-    safe_payload = _safe_json(payload)
     if level == "error":
-        logger.error(msg + " | data=" + safe_payload)
+        logger.error(msg + " | data=" + _safe_json(payload))
     elif level == "warning":
-        logger.warning(msg + " | data=" + safe_payload)
+        logger.warning(msg + " | data=" + _safe_json(payload))
     elif level == "info":
-        logger.info(msg + " | data=" + safe_payload)
+        logger.info(msg + " | data=" + _safe_json(payload))
     else:
-        logger.debug(msg + " | data=" + safe_payload)
+        # debug обычно отфильтрован: сериализуем payload, только если запись пишется
+        logger.opt(lazy=True).debug("{}", lambda: msg + " | data=" + _safe_json(payload))
 # --- END SAFE LOGGING HELPERS ---
 
+# Штраф в баллах за нарушение правила
+_RULE_PENALTIES = {
+    'no_html_tags': 3.0,              # Критично для Telegram
+    'no_markdown': 3.0,               # Критично для Telegram  
+    'required_emoji_sections': 3.0,   # Критично - основные блоки из промпта
+    'news_context_usage': 2.5,        # Критично - требование промпта
+    'company_examples': 2.0,          # Критично - требование промпта
+    'no_hash_symbols': 2.0,           # Критично для Telegram
+    'graphic_icons_not_bullets': 2.0, # Важно для оформления
+    'proper_structure': 2.0,          # Важно для читаемости
+    'russian_language': 2.0,          # Важно для целевой аудитории
+    'has_emojis': 1.5,               # Важно для оформления
+    'no_source_mentions': 1.5,        # Профессионализм
+    'astro_symbols_usage': 1.0,       # Дополнительно
+    'professional_tone': 1.0,         # Стиль
+    'no_direct_financial_advice': 1.0  # Юридические требования
+}
+
+# Правила, нарушения которых в отчете обратной связи считаются критичными
+_CRITICAL_RULES = ('no_html_tags', 'no_markdown', 'required_emoji_sections', 'news_context_usage')
+
+# Регулярные выражения компилируются один раз при импорте модуля,
+# а не при каждой проверке текста
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+_EXTRA_HTML_TAG_RE = re.compile(r'<(?!/?[bi]>)[^>]+>')
+_EMOJI_RE = re.compile(r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F1E0-\U0001F1FF\U00002600-\U000027BF\U0001F900-\U0001F9FF]')
+_NON_LETTERS_RE = re.compile(r'[^a-zA-Zа-яёА-ЯЁ]+')
+_EXTRA_NEWLINES_RE = re.compile(r'\n\s*\n\s*\n+')
+
+# Паттерны Markdown
+_MARKDOWN_PATTERNS = [
+    (re.compile(r'\*\*[^*]+\*\*', re.MULTILINE), '**жирный**'),      # **жирный**
+    (re.compile(r'__[^_]+__', re.MULTILINE), '__жирный__'),          # __жирный__
+    (re.compile(r'\*[^*\s]+[^*]*\*', re.MULTILINE), '*курсив*'),     # *курсив*
+    (re.compile(r'_[^_\s]+[^_]*_', re.MULTILINE), '_курсив_'),       # _курсив_
+    (re.compile(r'^#{1,6}\s', re.MULTILINE), '# заголовки'),         # # заголовки
+    (re.compile(r'^---+', re.MULTILINE), '--- разделители'),         # --- разделители
+    (re.compile(r'^\*\s', re.MULTILINE), '* списки'),               # * списки
+    (re.compile(r'^-\s', re.MULTILINE), '- списки'),                # - списки
+    (re.compile(r'^\+\s', re.MULTILINE), '+ списки'),               # + списки
+]
+
+# Все паттерны Markdown одной альтернацией: чистый текст проверяется за один проход
+_ANY_MARKDOWN_RE = re.compile(
+    '|'.join(f'(?:{pattern.pattern})' for pattern, _ in _MARKDOWN_PATTERNS), re.MULTILINE
+)
+
+# Обязательные блоки ТОЧНО как указано в COMPANY_ZODIAC_PROMPT:
+# (эмодзи, название, минимум слов, паттерн заголовка — эмодзи и первое
+# слово названия в одной строке)
+_REQUIRED_BLOCKS = [
+    (emoji, block_name, min_words,
+     re.compile(rf'{re.escape(emoji)}\s+[^\n]*{re.escape(block_name.split()[0])}', re.IGNORECASE))
+    for emoji, block_name, min_words in (
+        ('🌟', 'ВЛИЯНИЕ ЗНАКА ЗОДИАКА НА СУДЬБУ', 300),
+        ('🔮', 'ВЛИЯНИЕ ПЛАНЕТ И МЕСТА РЕГИСТРАЦИИ', 250),
+        ('💎', 'СИЛЬНЫЕ СТОРОНЫ И ПОТЕНЦИАЛ РОСТА', 300),
+        ('🧘', 'ФИЛОСОФСКАЯ КОНЦЕПЦИЯ КОМПАНИИ', 250),
+        ('⚠️', 'ПОТЕНЦИАЛЬНЫЕ РИСКИ И ВЫЗОВЫ', 200),
+        ('💼', 'БИЗНЕС-РЕКОМЕНДАЦИИ И СТРАТЕГИИ', 200)
+    )
+]
+_BLOCK_EMOJI_ORDER = [emoji for emoji, _, _, _ in _REQUIRED_BLOCKS]
+_BLOCK_EMOJI_RE = re.compile(r'🌟|🔮|💎|🧘|⚠️|💼')
+
+# Наборы символов, наличие которых проверяют правила
+_STRUCTURE_SECTIONS = ['🌟', '💎', '🚀', '⚠️']
+_GRAPHIC_ICONS = ['⭐', '🎯', '💫', '⚡', '🔥', '💎', '🚀', '⚠️', '💰']
+_ZODIAC_SIGNS = ['♈', '♉', '♊', '♋', '♌', '♍', '♎', '♏', '♐', '♑', '♒', '♓']
+_ASTRO_SYMBOLS = _ZODIAC_SIGNS + ['☉', '☽', '☿', '♀', '♂', '♃', '♄', '⛢', '♆', '♇']
+
+
+def _find_present(text: str, symbols: List[str], needed: int) -> List[str]:
+    """Символы из списка, встречающиеся в тексте; поиск прекращается на needed-м найденном"""
+    found = []
+    for symbol in symbols:
+        if symbol in text:
+            found.append(symbol)
+            if len(found) >= needed:
+                break
+    return found
+
+
+_HASH_LINE_RE = re.compile(r'^[^\n]*#[^\n]*$', re.MULTILINE)
+
+_BULLET_RES = [re.compile(p, re.MULTILINE) for p in (r'^\s*\*\s', r'^\s*-\s', r'^\s*•\s')]
+
+# (скомпилированный паттерн, исходная строка для сообщения об ошибке)
+_ADVICE_RES = [
+    (re.compile(p), p) for p in (
+        r'покупайте\s+акции', r'продавайте\s+акции', r'инвестируйте\s+в',
+        r'купите\s+', r'продайте\s+', r'вложите\s+деньги'
+    )
+]
+
+# Списки ключевых слов правил: подстроки для проверки в тексте в нижнем регистре
+_SOURCE_KEYWORDS = (
+    'источник', 'данные получены', 'согласно', 'по данным',
+    'newsdata', 'prokerala', 'gemini', 'openai', 'api'
+)
+_UNPROFESSIONAL_PHRASES = (
+    'извините', 'простите', 'к сожалению', 'возможно', 'наверное', 'может быть',
+    'я думаю', 'я считаю', 'по моему мнению'
+)
+# Ключевые слова, указывающие на использование новостного контекста
+_NEWS_INDICATORS = (
+    'согласно последним новостям', 'последние новости', 'текущие события',
+    'новости о', 'события в', 'согласно данным', 'по информации',
+    'недавние события', 'актуальная ситуация', 'текущая ситуация'
+)
+# Современные термины, которые могут указывать на новости
+_MODERN_TERMS = (
+    'экономика', 'рынок', 'инфляция', 'санкции', 'кризис',
+    'технологии', 'цифровизация', 'AI', 'искусственный интеллект',
+    'ESG', 'устойчивое развитие', 'глобализация'
+)
+# Известные компании разных знаков зодиака
+_FAMOUS_COMPANIES = (
+    'apple', 'microsoft', 'google', 'amazon', 'tesla', 'meta', 'netflix',
+    'nike', 'coca-cola', 'mcdonalds', 'starbucks', 'disney', 'bmw',
+    'mercedes', 'volkswagen', 'toyota', 'samsung', 'sony', 'lg',
+    'alibaba', 'tencent', 'baidu', 'xiaomi', 'huawei',
+    'сбербанк', 'газпром', 'лукойл', 'роснефт', 'яндекс', 'мтс'
+)
+
+# Признаки упоминания компаний для отчета обратной связи
+_COMPANY_KEYWORDS = ('компани', 'корпораци', 'бренд', 'apple', 'microsoft', 'google')
+
+# Паттерны для поиска примеров компаний
+_COMPANY_RES = [
+    re.compile(p, re.IGNORECASE) for p in (
+        r'компани[яи]\s+[А-ЯЁ][а-яё]+',           # компания Apple
+        r'бренд\s+[А-ЯЁ][а-яё]+',                # бренд Nike
+        r'корпораци[яи]\s+[А-ЯЁ][а-яё]+',        # корпорация Microsoft
+        r'гигант\s+[А-ЯЁ][а-яё]+',               # гигант Amazon
+        r'[А-ЯЁ][а-яё]+\s+(?:Inc|LLC|Corp|Ltd)', # Apple Inc
+        r'известн[ая].*[А-ЯЁ][а-яё]+',           # известная Tesla
+    )
+]
+
+# Замена непрофессиональных фраз одним проходом по тексту
+_UNPROFESSIONAL_REPLACEMENTS = {
+    'извините': '', 'простите': '', 'к сожалению': '',
+    'возможно': 'вероятно', 'наверное': 'скорее всего', 'может быть': 'вероятно',
+    'я думаю': '', 'я считаю': '', 'по моему мнению': ''
+}
+_UNPROFESSIONAL_RE = re.compile(
+    '|'.join(map(re.escape, _UNPROFESSIONAL_REPLACEMENTS)), re.IGNORECASE
+)
+
+
+def _replace_unprofessional(match) -> str:
+    return _UNPROFESSIONAL_REPLACEMENTS[match.group().lower()]
+
+
+# Замены fix_text в порядке применения: (паттерн, замена, символ-триггер).
+# Если триггера нет в тексте, паттерн заведомо не совпадет и проход пропускается
+_FIX_SUBS = [
+    # Убираем только запрещенные HTML-теги (сохраняем <b> и <i> для Telegram)
+    (_EXTRA_HTML_TAG_RE, '', '<'),
+    # Убираем Markdown
+    (re.compile(r'\*\*([^*]+)\*\*'), r'\1', '*'),  # **жирный**
+    (re.compile(r'__([^_]+)__'), r'\1', '_'),      # __жирный__
+    (re.compile(r'\*([^*]+)\*'), r'\1', '*'),      # *курсив*
+    (re.compile(r'_([^_]+)_'), r'\1', '_'),        # _курсив_
+    # Убираем символы # и заменяем на эмодзи
+    (re.compile(r'^#{1,6}\s*(.+)$', re.MULTILINE), r'🌟 \1', '#'),
+    (re.compile(r'###\s*(.+)'), r'💎 \1', '#'),
+    (re.compile(r'##\s*(.+)'), r'🚀 \1', '#'),
+    (re.compile(r'#\s*(.+)'), r'⭐ \1', '#'),
+    # Заменяем разделители
+    (re.compile(r'^---+$', re.MULTILINE), '', '---'),
+    (re.compile(r'^===+$', re.MULTILINE), '', '==='),
+    # Убираем упоминания источников
+    (re.compile(r'(источник|данные получены|согласно|по данным)', re.IGNORECASE), '', None),
+    (re.compile(r'(newsdata|prokerala|gemini|openai|api)', re.IGNORECASE), '', None),
+    # Заменяем обычные маркеры на графические иконки (только если их еще нет)
+    (re.compile(r'^\s*\*\s+(?!⭐|💫|🎯|⚡|🔥|💎|🚀|⚠️|💰)(.+)', re.MULTILINE), r'⭐ \1', '*'),
+    (re.compile(r'^\s*-\s+(?!⭐|💫|🎯|⚡|🔥|💎|🚀|⚠️|💰)(.+)', re.MULTILINE), r'💫 \1', '-'),
+    (re.compile(r'^\s*•\s+(?!⭐|💫|🎯|⚡|🔥|💎|🚀|⚠️|💰)(.+)', re.MULTILINE), r'🎯 \1', '•'),
+    # Убираем непрофессиональные фразы
+    (_UNPROFESSIONAL_RE, _replace_unprofessional, None),
+]
+_SECTION_SPACING_RE = re.compile(r'(\n)(🌟|💎|🚀|⚠️|📈|🔮|💼|🎯|💡|✨)')
+
+_FORMATTING_MARKDOWN_RE = re.compile(r'\*\*[^*]+\*\*|__[^_]+__|^#{1,6}\s', re.MULTILINE)
+_FORMATTING_BULLET_RE = re.compile(r'^\s*[\*\-•]\s', re.MULTILINE)
+
 
 class PromptValidator:
     """Валидатор соответствия промптам"""
     
+    # Правила в порядке убывания штрафа: (имя, метод проверки, штраф).
+    # Тяжелые нарушения проверяются первыми, что ускоряет fast_fail
+    validation_rules = tuple(sorted(
+        ((rule_name, f'_check_{rule_name}', penalty) for rule_name, penalty in _RULE_PENALTIES.items()),
+        key=lambda rule: -rule[2]
+    ))
+    
     def __init__(self):
         """Инициализация валидатора"""
-        self.validation_rules = {
-            'no_html_tags': self._check_no_html_tags,
-            'no_markdown': self._check_no_markdown,
-            'has_emojis': self._check_has_emojis,
-            'proper_structure': self._check_proper_structure,
-            'no_hash_symbols': self._check_no_hash_symbols,
-            'required_emoji_sections': self._check_required_emoji_sections,
-            'graphic_icons_not_bullets': self._check_graphic_icons_not_bullets,
-            'astro_symbols_usage': self._check_astro_symbols_usage,
-            'russian_language': self._check_russian_language,
-            'no_source_mentions': self._check_no_source_mentions,
-            'professional_tone': self._check_professional_tone,
-            'no_direct_financial_advice': self._check_no_direct_financial_advice,
-            'news_context_usage': self._check_news_context_usage,
-            'company_examples': self._check_company_examples
-        }
+        # LRU-кэш результатов: повторная проверка того же текста (например,
+        # когда fix_text ничего не изменил) не прогоняет правила заново
+        self._result_cache: 'OrderedDict[bytes, Tuple[float, Tuple[str, ...]]]' = OrderedDict()
+        self._result_cache_size = 256
+        # validate_text вызывается и из потоков (asyncio.to_thread)
+        self._result_cache_lock = threading.Lock()
     
-    def validate_text(self, text: str, analysis_type: str = "zodiac") -> Tuple[bool, List[str]]:
+    def validate_text(self, text: str, analysis_type: str = "zodiac",
+                      fast_fail: bool = False) -> Tuple[bool, List[str], float]:
         """
         СТРОГАЯ проверка текста на соответствие промптам с детальным анализом
         
         Args:
             text (str): Текст для проверки
             analysis_type (str): Тип анализа
+            fast_fail (bool): Прекратить проверку, как только оценка упала ниже
+                порога (список ошибок будет неполным)
             
         Returns:
-            Tuple[bool, List[str]]: (валиден ли текст, список ошибок с количественной оценкой)
+            Tuple[bool, List[str], float]: (валиден ли текст, список ошибок с количественной оценкой, оценка 1-10)
         """
+        # В кэше только полные результаты: по ним же отвечаем и на fast_fail
+        # (вердикт тот же), а неполный список ошибок fast_fail не кэшируем
+        cache_key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+        with self._result_cache_lock:
+            cached_result = self._result_cache.get(cache_key)
+            if cached_result is not None:
+                self._result_cache.move_to_end(cache_key)
+        
+        if cached_result is not None:
+            logger.debug("📦 Результат проверки из кэша")
+            score, cached_errors = cached_result
+            errors = list(cached_errors)
+        else:
+            score, errors = self._apply_rules(text, fast_fail)
+            if not fast_fail or score >= 7.0:
+                # Валидный текст fast_fail проверяет целиком: результат полный
+                with self._result_cache_lock:
+                    self._result_cache[cache_key] = (score, tuple(errors))
+                    if len(self._result_cache) > self._result_cache_size:
+                        self._result_cache.popitem(last=False)
+        
+        is_valid = score >= 7.0  # Минимальный порог для валидности
+        
+        if not is_valid:
+            logger.warning("⚠️ ОСНОВНОЙ АГЕНТ НЕ СОБЛЮДАЕТ ПРОМПТ (%s): Оценка %.1f/10", analysis_type, score)
+            logger.warning("📋 Список нарушений: %s", errors[:5])  # Показываем первые 5 ошибок
+        else:
+            logger.info("✅ Текст соответствует промпту (%s): Оценка %.1f/10", analysis_type, score)
+        
+        return is_valid, errors, score
+    
+    def _apply_rules(self, text: str, fast_fail: bool) -> Tuple[float, List[str]]:
+        """Прогон всех правил: (оценка 1-10, список ошибок)"""
         errors = []
         score = 10.0  # Начальная оценка
+        # Нижний регистр считаем один раз и передаем во все правила
+        text_lower = text.lower()
         
         # Подробная проверка каждого правила с вычетом баллов
-        for rule_name, rule_func in self.validation_rules.items():
+        for rule_name, method_name, penalty in self.validation_rules:
             try:
-                is_valid, error_msg = rule_func(text)
+                is_valid, error_msg = getattr(self, method_name)(text, text_lower)
                 if not is_valid:
                     # Вычитаем баллы за нарушения
-                    penalty = self._get_penalty_for_rule(rule_name)
                     score -= penalty
                     errors.append(f"{rule_name} (-{penalty} баллов): {error_msg}")
             except Exception as e:
                 score -= 1.0
                 errors.append(f"{rule_name} (ошибка проверки, -1 балл): {e}")
+            
+            # Штрафы только уменьшают оценку: ниже порога текст уже не вернется
+            if fast_fail and score < 7.0:
+                break
         
         # Обеспечиваем минимальную оценку 1.0
-        score = max(1.0, score)
-        is_valid = score >= 7.0  # Минимальный порог для валидности
-        
-        if not is_valid:
-            logger.warning("⚠️ ОСНОВНОЙ АГЕНТ НЕ СОБЛЮДАЕТ ПРОМПТ (%s): Оценка %.1f/10", analysis_type, score)
-            logger.warning("📋 Список нарушений: %s", errors[:5])  # Показываем первые 5 ошибок
-        else:
-            logger.info("✅ Текст соответствует промпту (%s): Оценка %.1f/10", analysis_type, score)
-        
-        return is_valid, errors
-    
-    def _get_penalty_for_rule(self, rule_name: str) -> float:
-        """Получить штраф в баллах за нарушение правила"""
-        penalty_map = {
-            'no_html_tags': 3.0,              # Критично для Telegram
-            'no_markdown': 3.0,               # Критично для Telegram  
-            'required_emoji_sections': 3.0,   # Критично - основные блоки из промпта
-            'news_context_usage': 2.5,        # Критично - требование промпта
-            'company_examples': 2.0,          # Критично - требование промпта
-            'no_hash_symbols': 2.0,           # Критично для Telegram
-            'graphic_icons_not_bullets': 2.0, # Важно для оформления
-            'proper_structure': 2.0,          # Важно для читаемости
-            'russian_language': 2.0,          # Важно для целевой аудитории
-            'has_emojis': 1.5,               # Важно для оформления
-            'no_source_mentions': 1.5,        # Профессионализм
-            'astro_symbols_usage': 1.0,       # Дополнительно
-            'professional_tone': 1.0,         # Стиль
-            'no_direct_financial_advice': 1.0  # Юридические требования
-        }
-        return penalty_map.get(rule_name, 1.0)
+        return max(1.0, score), errors
     
-    def _check_no_html_tags(self, text: str) -> Tuple[bool, str]:
+    def _check_no_html_tags(self, text: str, text_lower: str) -> Tuple[bool, str]:
         """СТРОГАЯ проверка отсутствия HTML-тегов (КРИТИЧНО для Telegram)"""
         # Запрещенные HTML теги (включая <b> и <i> - используем только простой текст)
-        forbidden_tags = re.findall(r'<[^>]+>', text)
+        if not _HTML_TAG_RE.search(text):
+            return True, ""
+        
+        # Полный список тегов нужен только для сообщения об ошибке
+        forbidden_tags = _HTML_TAG_RE.findall(text)
         if forbidden_tags:
             unique_tags = list(set(forbidden_tags))
             return False, f"КРИТИЧНО: Найдены HTML-теги: {unique_tags[:10]} (всего: {len(forbidden_tags)})"
         return True, ""
     
-    def _check_no_markdown(self, text: str) -> Tuple[bool, str]:
+    def _check_no_markdown(self, text: str, text_lower: str) -> Tuple[bool, str]:
         """СТРОГАЯ проверка отсутствия Markdown (КРИТИЧНО для Telegram)"""
-        markdown_violations = []
+        if not _ANY_MARKDOWN_RE.search(text):
+            return True, ""
         
-        # Паттерны Markdown
-        markdown_patterns = [
-            (r'\*\*[^*]+\*\*', '**жирный**'),      # **жирный**
-            (r'__[^_]+__', '__жирный__'),          # __жирный__
-            (r'\*[^*\s]+[^*]*\*', '*курсив*'),     # *курсив*
-            (r'_[^_\s]+[^_]*_', '_курсив_'),       # _курсив_
-            (r'^#{1,6}\s', '# заголовки'),         # # заголовки
-            (r'^---+', '--- разделители'),         # --- разделители
-            (r'^\*\s', '* списки'),               # * списки  
-            (r'^-\s', '- списки'),                # - списки
-            (r'^\+\s', '+ списки'),               # + списки
-        ]
+        markdown_violations = []
         
-        for pattern, description in markdown_patterns:
-            matches = re.findall(pattern, text, re.MULTILINE)
-            if matches:
-                markdown_violations.extend([f"{description}: {m[:50]}..." for m in matches[:3]])
+        # В сообщение попадают не более 3 совпадений на паттерн и 5 всего
+        for pattern, description in _MARKDOWN_PATTERNS:
+            for match in islice(pattern.finditer(text), 3):
+                markdown_violations.append(f"{description}: {match.group()[:50]}...")
+            if len(markdown_violations) >= 5:
+                break
         
         if markdown_violations:
             return False, f"КРИТИЧНО: Найден Markdown: {markdown_violations[:5]}"
         
         return True, ""
     
-    def _check_has_emojis(self, text: str) -> Tuple[bool, str]:
+    def _check_has_emojis(self, text: str, text_lower: str) -> Tuple[bool, str]:
         """Проверка наличия эмодзи"""
-        emoji_pattern = r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F1E0-\U0001F1FF\U00002600-\U000027BF\U0001F900-\U0001F9FF]'
-        emojis = re.findall(emoji_pattern, text)
+        # Считаем до первых 5 эмодзи; при нехватке счетчик равен их общему числу
+        emoji_count = sum(1 for _ in islice(_EMOJI_RE.finditer(text), 5))
         
-        if len(emojis) < 5:
-            return False, f"Недостаточно эмодзи: {len(emojis)} (нужно минимум 5)"
+        if emoji_count < 5:
+            return False, f"Недостаточно эмодзи: {emoji_count} (нужно минимум 5)"
         
         return True, ""
     
-    def _check_proper_structure(self, text: str) -> Tuple[bool, str]:
+    def _check_proper_structure(self, text: str, text_lower: str) -> Tuple[bool, str]:
         """Проверка правильной структуры"""
         # Проверяем наличие разделов с эмодзи
-        required_sections = ['🌟', '💎', '🚀', '⚠️']
-        found_sections = []
-        
-        for section in required_sections:
-            if section in text:
-                found_sections.append(section)
+        found_sections = _find_present(text, _STRUCTURE_SECTIONS, 3)
         
         if len(found_sections) < 3:
-            return False, f"Недостаточно разделов: {found_sections} (нужно минимум 3 из {required_sections})"
+            return False, f"Недостаточно разделов: {found_sections} (нужно минимум 3 из {_STRUCTURE_SECTIONS})"
         
         return True, ""
     
-    def _check_no_hash_symbols(self, text: str) -> Tuple[bool, str]:
+    def _check_no_hash_symbols(self, text: str, text_lower: str) -> Tuple[bool, str]:
         """Проверка отсутствия символов #"""
         if '#' in text:
-            hash_lines = [line.strip() for line in text.split('\n') if '#' in line]
+            # Для сообщения нужны только первые 3 строки: не делим весь текст
+            hash_lines = [match.group().strip() for match in islice(_HASH_LINE_RE.finditer(text), 3)]
             return False, f"Найдены символы #: {hash_lines[:3]}"
         
         return True, ""
     
-    def _check_required_emoji_sections(self, text: str) -> Tuple[bool, str]:
+    def _check_required_emoji_sections(self, text: str, text_lower: str) -> Tuple[bool, str]:
         """СТРОГАЯ проверка наличия обязательных 6 блоков из prompts.py"""
-        # Обязательные блоки ТОЧНО как указано в COMPANY_ZODIAC_PROMPT
-        required_blocks = [
-            ('🌟', 'ВЛИЯНИЕ ЗНАКА ЗОДИАКА НА СУДЬБУ', 300),
-            ('🔮', 'ВЛИЯНИЕ ПЛАНЕТ И МЕСТА РЕГИСТРАЦИИ', 250),
-            ('💎', 'СИЛЬНЫЕ СТОРОНЫ И ПОТЕНЦИАЛ РОСТА', 300),
-            ('🧘', 'ФИЛОСОФСКАЯ КОНЦЕПЦИЯ КОМПАНИИ', 250),
-            ('⚠️', 'ПОТЕНЦИАЛЬНЫЕ РИСКИ И ВЫЗОВЫ', 200),
-            ('💼', 'БИЗНЕС-РЕКОМЕНДАЦИИ И СТРАТЕГИИ', 200)
-        ]
+        # Один проход по тексту: позиции всех эмодзи блоков по порядку
+        block_starts = []
+        emoji_positions = {}
+        for match in _BLOCK_EMOJI_RE.finditer(text):
+            block_starts.append(match.start())
+            emoji_positions.setdefault(match.group(), []).append(match.start())
         
         missing_blocks = []
         insufficient_blocks = []
         
-        for emoji, block_name, min_words in required_blocks:
-            # Проверяем наличие эмодзи в заголовке блока
-            block_pattern = rf'{re.escape(emoji)}\s+[^\\n]*{re.escape(block_name.split()[0])}'
-            block_match = re.search(block_pattern, text, re.IGNORECASE)
+        for emoji, block_name, min_words, block_re in _REQUIRED_BLOCKS:
+            # Проверяем наличие эмодзи в заголовке блока: заголовок может
+            # начинаться только с одного из найденных вхождений эмодзи
+            block_match = None
+            for pos in emoji_positions.get(emoji, ()):
+                block_match = block_re.match(text, pos)
+                if block_match:
+                    break
             
             if not block_match:
                 # Проверяем просто наличие эмодзи
-                if emoji not in text:
+                if emoji not in emoji_positions:
                     missing_blocks.append(f"{emoji} {block_name}")
                 else:
                     missing_blocks.append(f"{emoji} {block_name} (неправильный заголовок)")
             else:
-                # Проверяем объем блока (примерная проверка)
-                # Находим начало и конец блока
+                # Проверяем объем блока: от заголовка до следующего блока или конца текста
                 start_pos = block_match.end()
-                # Ищем следующий блок или конец текста
-                next_block_pattern = r'🌟|🔮|💎|🧘|⚠️|💼'
-                next_match = re.search(next_block_pattern, text[start_pos:])
+                next_idx = bisect_left(block_starts, start_pos)
                 
-                if next_match:
-                    block_text = text[start_pos:start_pos + next_match.start()]
+                if next_idx < len(block_starts):
+                    block_text = text[start_pos:block_starts[next_idx]]
                 else:
                     block_text = text[start_pos:]
                 
-                word_count = len(block_text.split())
+                # Слова сверх min_words не считаем: для проверки они не нужны
+                word_count = len(block_text.split(None, min_words))
                 if word_count < min_words * 0.7:  # Допускаем 30% отклонение
                     insufficient_blocks.append(f"{emoji} {block_name} ({word_count} слов, нужно {min_words}+)")
         
         # Проверяем общий объем
-        total_words = len(text.split())
+        total_words = len(text.split(None, 1200))
         errors = []
         
         if missing_blocks:
@@ -248,19 +446,15 @@ class PromptValidator:
             errors.append(f"Общий объем {total_words} слов недостаточен (нужно 1500+ слов)")
         
         # Проверяем правильный порядок блоков
-        emoji_order = ['🌟', '🔮', '💎', '🧘', '⚠️', '💼']
-        found_positions = []
-        
-        for emoji in emoji_order:
-            pos = text.find(emoji)
-            if pos != -1:
-                found_positions.append((emoji, pos))
+        found_positions = [
+            (emoji, emoji_positions[emoji][0]) for emoji in _BLOCK_EMOJI_ORDER if emoji in emoji_positions
+        ]
         
         # Проверяем, что найденные блоки идут в правильном порядке
         if len(found_positions) > 1:
             sorted_positions = sorted(found_positions, key=lambda x: x[1])
             expected_order = [emoji for emoji, _ in sorted_positions]
-            actual_order = [emoji for emoji in emoji_order if emoji in expected_order]
+            actual_order = [emoji for emoji in _BLOCK_EMOJI_ORDER if emoji in expected_order]
             
             if expected_order != actual_order:
                 errors.append(f"Неправильный порядок блоков: найдено {expected_order}, ожидается {actual_order}")
@@ -270,11 +464,13 @@ class PromptValidator:
         
         return True, ""
     
-    def _check_russian_language(self, text: str) -> Tuple[bool, str]:
+    def _check_russian_language(self, text: str, text_lower: str) -> Tuple[bool, str]:
         """Проверка использования русского языка"""
-        # Простая проверка наличия кириллицы
-        cyrillic_chars = len(re.findall(r'[а-яё]', text.lower()))
-        total_letters = len(re.findall(r'[a-zA-Zа-яёА-ЯЁ]', text))
+        # Простая проверка наличия кириллицы: оставляем только буквы одним
+        # проходом, латиница среди них — это ровно ASCII-символы
+        letters = _NON_LETTERS_RE.sub('', text)
+        total_letters = len(letters)
+        cyrillic_chars = total_letters - len(letters.encode('ascii', 'ignore'))
         
         if total_letters > 0:
             cyrillic_ratio = cyrillic_chars / total_letters
@@ -283,82 +479,62 @@ class PromptValidator:
         
         return True, ""
     
-    def _check_no_source_mentions(self, text: str) -> Tuple[bool, str]:
+    def _check_no_source_mentions(self, text: str, text_lower: str) -> Tuple[bool, str]:
         """Проверка отсутствия упоминания источников"""
-        source_keywords = [
-            'источник', 'данные получены', 'согласно', 'по данным',
-            'newsdata', 'prokerala', 'gemini', 'openai', 'api'
-        ]
-        
-        text_lower = text.lower()
-        found_sources = [word for word in source_keywords if word in text_lower]
+        found_sources = [word for word in _SOURCE_KEYWORDS if word in text_lower]
         
         if found_sources:
             return False, f"Найдены упоминания источников: {found_sources}"
         
         return True, ""
     
-    def _check_graphic_icons_not_bullets(self, text: str) -> Tuple[bool, str]:
+    def _check_graphic_icons_not_bullets(self, text: str, text_lower: str) -> Tuple[bool, str]:
         """Проверка использования графических иконок вместо обычных маркеров"""
         # Ищем обычные маркеры
-        bullet_patterns = [r'^\s*\*\s', r'^\s*-\s', r'^\s*•\s']
         found_bullets = []
         
-        for pattern in bullet_patterns:
-            matches = re.findall(pattern, text, re.MULTILINE)
-            if matches:
-                found_bullets.extend(matches)
+        # Для сообщения достаточно первых 3 маркеров
+        for pattern in _BULLET_RES:
+            found_bullets.extend(match.group() for match in islice(pattern.finditer(text), 3 - len(found_bullets)))
+            if len(found_bullets) >= 3:
+                break
         
         if found_bullets:
             return False, f"Найдены обычные маркеры вместо графических иконок: {found_bullets[:3]}"
         
         # Проверяем наличие графических иконок из prompts.py
-        required_icons = ['⭐', '🎯', '💫', '⚡', '🔥', '💎', '🚀', '⚠️', '💰']
-        found_icons = [icon for icon in required_icons if icon in text]
+        found_icons = _find_present(text, _GRAPHIC_ICONS, 3)
         
         if len(found_icons) < 3:
-            return False, f"Недостаточно графических иконок. Найдено: {found_icons}, нужно минимум 3 из {required_icons}"
+            return False, f"Недостаточно графических иконок. Найдено: {found_icons}, нужно минимум 3 из {_GRAPHIC_ICONS}"
         
         return True, ""
     
-    def _check_astro_symbols_usage(self, text: str) -> Tuple[bool, str]:
+    def _check_astro_symbols_usage(self, text: str, text_lower: str) -> Tuple[bool, str]:
         """Проверка использования астрологических символов"""
-        astro_symbols = ['♈', '♉', '♊', '♋', '♌', '♍', '♎', '♏', '♐', '♑', '♒', '♓', '☉', '☽', '☿', '♀', '♂', '♃', '♄', '⛢', '♆', '♇']
-        found_symbols = [symbol for symbol in astro_symbols if symbol in text]
+        found_symbols = _find_present(text, _ASTRO_SYMBOLS, 2)
         
         if len(found_symbols) < 2:
             return False, f"Недостаточно астрологических символов. Найдено: {found_symbols}, нужно минимум 2"
         
         return True, ""
     
-    def _check_professional_tone(self, text: str) -> Tuple[bool, str]:
+    def _check_professional_tone(self, text: str, text_lower: str) -> Tuple[bool, str]:
         """Проверка профессионального тона"""
         # Ищем непрофессиональные фразы
-        unprofessional_phrases = [
-            'извините', 'простите', 'к сожалению', 'возможно', 'наверное', 'может быть',
-            'я думаю', 'я считаю', 'по моему мнению'
-        ]
-        
-        text_lower = text.lower()
-        found_unprofessional = [phrase for phrase in unprofessional_phrases if phrase in text_lower]
+        found_unprofessional = [phrase for phrase in _UNPROFESSIONAL_PHRASES if phrase in text_lower]
         
         if found_unprofessional:
             return False, f"Найдены непрофессиональные фразы: {found_unprofessional[:3]}"
         
         return True, ""
     
-    def _check_no_direct_financial_advice(self, text: str) -> Tuple[bool, str]:
+    def _check_no_direct_financial_advice(self, text: str, text_lower: str) -> Tuple[bool, str]:
         """Проверка отсутствия прямых финансовых советов"""
-        direct_advice_patterns = [
-            r'покупайте\s+акции', r'продавайте\s+акции', r'инвестируйте\s+в',
-            r'купите\s+', r'продайте\s+', r'вложите\s+деньги'
-        ]
-        
-        text_lower = text.lower()
         found_advice = []
         
-        for pattern in direct_advice_patterns:
-            if re.search(pattern, text_lower):
+        for pattern_re, pattern in _ADVICE_RES:
+            if pattern_re.search(text_lower):
                 found_advice.append(pattern)
         
         if found_advice:
@@ -366,66 +542,32 @@ class PromptValidator:
         
         return True, ""
     
-    def _check_news_context_usage(self, text: str) -> Tuple[bool, str]:
+    def _check_news_context_usage(self, text: str, text_lower: str) -> Tuple[bool, str]:
         """КРИТИЧНАЯ проверка использования контекста новостей"""
-        # Ключевые слова, указывающие на использование новостного контекста
-        news_indicators = [
-            'согласно последним новостям', 'последние новости', 'текущие события',
-            'новости о', 'события в', 'согласно данным', 'по информации',
-            'недавние события', 'актуальная ситуация', 'текущая ситуация'
-        ]
-        
-        text_lower = text.lower()
-        found_indicators = [indicator for indicator in news_indicators if indicator in text_lower]
+        found_indicators = [indicator for indicator in _NEWS_INDICATORS if indicator in text_lower]
         
         if not found_indicators:
             # Проверяем наличие современных терминов, которые могут указывать на новости
-            modern_terms = [
-                'экономика', 'рынок', 'инфляция', 'санкции', 'кризис', 
-                'технологии', 'цифровизация', 'AI', 'искусственный интеллект',
-                'ESG', 'устойчивое развитие', 'глобализация'
-            ]
-            
-            found_modern = [term for term in modern_terms if term in text_lower]
+            found_modern = [term for term in _MODERN_TERMS if term in text_lower]
             
             if len(found_modern) < 2:
                 return False, f"КРИТИЧНО: Отсутствует контекст новостей и современных событий. Найдено индикаторов: {found_indicators}, современных терминов: {found_modern}"
         
         return True, f"Найдены индикаторы новостного контекста: {found_indicators[:3]}"
     
-    def _check_company_examples(self, text: str) -> Tuple[bool, str]:
+    def _check_company_examples(self, text: str, text_lower: str) -> Tuple[bool, str]:
         """КРИТИЧНАЯ проверка наличия примеров известных компаний"""
-        # Паттерны для поиска примеров компаний
-        company_patterns = [
-            r'компани[яи]\s+[А-ЯЁ][а-яё]+',           # компания Apple
-            r'бренд\s+[А-ЯЁ][а-яё]+',                # бренд Nike
-            r'корпораци[яи]\s+[А-ЯЁ][а-яё]+',        # корпорация Microsoft
-            r'гигант\s+[А-ЯЁ][а-яё]+',               # гигант Amazon
-            r'[А-ЯЁ][а-яё]+\s+(?:Inc|LLC|Corp|Ltd)', # Apple Inc
-            r'известн[ая].*[А-ЯЁ][а-яё]+',           # известная Tesla
-        ]
-        
-        # Известные компании разных знаков зодиака
-        famous_companies = [
-            'apple', 'microsoft', 'google', 'amazon', 'tesla', 'meta', 'netflix',
-            'nike', 'coca-cola', 'mcdonalds', 'starbucks', 'disney', 'bmw',
-            'mercedes', 'volkswagen', 'toyota', 'samsung', 'sony', 'lg',
-            'alibaba', 'tencent', 'baidu', 'xiaomi', 'huawei',
-            'сбербанк', 'газпром', 'лукойл', 'роснефт', 'яндекс', 'мтс'
-        ]
-        
-        text_lower = text.lower()
-        found_companies = []
-        
         # Поиск прямых упоминаний известных компаний
-        for company in famous_companies:
-            if company in text_lower:
-                found_companies.append(company)
+        found_companies = [company for company in _FAMOUS_COMPANIES if company in text_lower]
+        
+        # Двух известных компаний достаточно: регулярные выражения не запускаем
+        if len(found_companies) >= 2:
+            return True, f"Найдены примеры компаний: {found_companies[:3]}"
         
         # Поиск паттернов упоминания компаний
         company_mentions = []
-        for pattern in company_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
+        for pattern in _COMPANY_RES:
+            matches = pattern.findall(text)
             company_mentions.extend(matches[:3])  # Не более 3 для каждого паттерна
         
         total_examples = len(found_companies) + len(company_mentions)
@@ -445,43 +587,9 @@ class PromptValidator:
         Returns:
             str: Исправленный текст
         """
-        # Убираем только запрещенные HTML-теги (сохраняем <b> и <i> для Telegram)
-        text = re.sub(r'<(?!/?[bi]>)[^>]+>', '', text)
-        
-        # Убираем Markdown
-        text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)  # **жирный**
-        text = re.sub(r'__([^_]+)__', r'\1', text)      # __жирный__
-        text = re.sub(r'\*([^*]+)\*', r'\1', text)      # *курсив*
-        text = re.sub(r'_([^_]+)_', r'\1', text)        # _курсив_
-        
-        # Убираем символы # и заменяем на эмодзи
-        text = re.sub(r'^#{1,6}\s*(.+)$', r'🌟 \1', text, flags=re.MULTILINE)
-        text = re.sub(r'###\s*(.+)', r'💎 \1', text)
-        text = re.sub(r'##\s*(.+)', r'🚀 \1', text)
-        text = re.sub(r'#\s*(.+)', r'⭐ \1', text)
-        
-        # Заменяем разделители
-        text = re.sub(r'^---+$', '', text, flags=re.MULTILINE)
-        text = re.sub(r'^===+$', '', text, flags=re.MULTILINE)
-        
-        # Убираем упоминания источников
-        text = re.sub(r'(источник|данные получены|согласно|по данным)', '', text, flags=re.IGNORECASE)
-        text = re.sub(r'(newsdata|prokerala|gemini|openai|api)', '', text, flags=re.IGNORECASE)
-        
-        # Заменяем обычные маркеры на графические иконки (только если их еще нет)
-        text = re.sub(r'^\s*\*\s+(?!⭐|💫|🎯|⚡|🔥|💎|🚀|⚠️|💰)(.+)', r'⭐ \1', text, flags=re.MULTILINE)
-        text = re.sub(r'^\s*-\s+(?!⭐|💫|🎯|⚡|🔥|💎|🚀|⚠️|💰)(.+)', r'💫 \1', text, flags=re.MULTILINE)
-        text = re.sub(r'^\s*•\s+(?!⭐|💫|🎯|⚡|🔥|💎|🚀|⚠️|💰)(.+)', r'🎯 \1', text, flags=re.MULTILINE)
-        
-        # Убираем непрофессиональные фразы
-        unprofessional_replacements = {
-            'извините': '', 'простите': '', 'к сожалению': '',
-            'возможно': 'вероятно', 'наверное': 'скорее всего', 'может быть': 'вероятно',
-            'я думаю': '', 'я считаю': '', 'по моему мнению': ''
-        }
-        
-        for phrase, replacement in unprofessional_replacements.items():
-            text = re.sub(phrase, replacement, text, flags=re.IGNORECASE)
+        for pattern, replacement, trigger in _FIX_SUBS:
+            if trigger is None or trigger in text:
+                text = pattern.sub(replacement, text)
         
         # Добавляем обязательные 6 блоков если их нет
         if '🌟' not in text or 'ВЛИЯНИЕ ЗНАКА ЗОДИАКА' not in text:
@@ -498,32 +606,55 @@ class PromptValidator:
             text = text + '\n\n💼 БИЗНЕС-РЕКОМЕНДАЦИИ И СТРАТЕГИИ'
         
         # Добавляем пустые строки между разделами с эмодзи
-        text = re.sub(r'(\n)(🌟|💎|🚀|⚠️|📈|🔮|💼|🎯|💡|✨)', r'\1\n\2', text)
+        text = _SECTION_SPACING_RE.sub(r'\1\n\2', text)
         
         # Убираем лишние переносы
-        text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
+        text = _EXTRA_NEWLINES_RE.sub('\n\n', text)
         
         return text.strip()
 
 
+# Валидаторы общие для всех экземпляров ValidationAgent в процессе.
+# _claude_agent: None — еще не создавался, False — Anthropic недоступен
+_claude_agent = None
+_fallback_validator = PromptValidator()
+
+# Ограничение одновременных регенераций у основного агента: при множестве
+# пользователей запросы к LLM выстраиваются в очередь, а не уходят все сразу
+_regeneration_semaphore = asyncio.Semaphore(5)
+
+
 class ValidationAgent:
     """Агент для валидации и исправления промптов с RLHF"""
     
     def __init__(self):
         """Инициализация агента валидации"""
+        global _claude_agent
+        
         # Используем Anthropic валидатор как основной
-        try:
-            from validation_agent.claude_validator import AnthropicValidationAgent
-            self.claude_agent = AnthropicValidationAgent()
+        if _claude_agent is None:
+            try:
+                from validation_agent.claude_validator import AnthropicValidationAgent
+                _claude_agent = AnthropicValidationAgent()
+                logger.info("✅ Anthropic валидатор инициализирован")
+            except Exception as e:
+                logger.warning("⚠️ Anthropic валидатор недоступен: %s", str(e))
+                _claude_agent = False
+        
+        if _claude_agent:
+            self.claude_agent = _claude_agent
             self.use_claude = True
-            logger.info("✅ Anthropic валидатор инициализирован")
-        except Exception as e:
-            logger.warning("⚠️ Anthropic валидатор недоступен: %s", str(e))
+        else:
             # Резервный локальный валидатор
-            self.validator = PromptValidator()
+            self.validator = _fallback_validator
             self.use_claude = False
             logger.info("✅ Резервный валидатор инициализирован")
     
+    async def aclose(self):
+        """Освобождение сетевых ресурсов Anthropic валидатора"""
+        if hasattr(self, 'claude_agent'):
+            await self.claude_agent.aclose()
+    
     async def validate_and_fix(self, text: str, analysis_type: str = "zodiac", original_prompt: str = "") -> str:
         """
         Валидация и исправление текста до достижения минимум 7 баллов
@@ -575,17 +706,15 @@ class ValidationAgent:
             return "Анализ недоступен"
         
         # Минимальная обработка для читаемости
-        text = re.sub(r'<(?!/?[bi]>)[^>]+>', '', text)  # Убираем лишние HTML
-        text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)  # Нормализуем переносы
+        text = _EXTRA_HTML_TAG_RE.sub('', text)  # Убираем лишние HTML
+        text = _EXTRA_NEWLINES_RE.sub('\n\n', text)  # Нормализуем переносы
         
         return text.strip()
     
     async def _fallback_validation(self, text: str, analysis_type: str, original_prompt: str) -> str:
         """Резервная валидация при недоступности Claude"""
-        import asyncio
-        
         if not hasattr(self, 'validator'):
-            self.validator = PromptValidator()
+            self.validator = _fallback_validator
         
         current_text = text
         max_iterations = 2  # Уменьшаем для резервного режима
@@ -597,15 +726,17 @@ class ValidationAgent:
             iteration += 1
             logger.info("🔄 Итерация валидации #%d", iteration)
             
-            # Локальная валидация
-            is_valid_local, local_errors = self.validator.validate_text(current_text, analysis_type)
+            # Локальная валидация (в потоке, чтобы не блокировать event loop)
+            is_valid_local, local_errors, _ = await asyncio.to_thread(
+                self.validator.validate_text, current_text, analysis_type, fast_fail=True
+            )
             
             if is_valid_local:
                 logger.info("✅ Резервная валидация завершена за %d итераций", iteration)
                 return current_text
             
             # Исправляем локально
-            current_text = self.validator.fix_text(current_text)
+            current_text = await asyncio.to_thread(self.validator.fix_text, current_text)
             logger.info("🔧 Текст исправлен локально (итерация %d)", iteration)
             
             # Пауза между итерациями
@@ -635,22 +766,46 @@ class ValidationAgent:
         """
         logger.info("🔧 ЗАПУСК ВАЛИДАЦИИ С ОБРАТНОЙ СВЯЗЬЮ ДЛЯ ОСНОВНОГО АГЕНТА")
         
-        # Получаем детальную оценку
-        is_valid, error_list = self.validate_text(text, analysis_type)
-        score = max(1.0, 10.0 - sum([self._get_penalty_for_rule(err.split(' ')[0]) for err in error_list]))
+        # Получаем детальную оценку (всегда по локальным правилам). Проверки
+        # правил — CPU-работа на длинном тексте, выполняем их вне event loop
+        is_valid, error_list, score = await asyncio.to_thread(
+            _fallback_validator.validate_text, text, analysis_type
+        )
+        
+        if score >= 10.0:
+            # Нарушений нет: разбор недостающих требований не нужен
+            logger.info("🎯 Текущая оценка: %.1f/10 (цель: 10.0)", score)
+            logger.info("🎉 ОСНОВНОЙ АГЕНТ ДОСТИГ СОВЕРШЕНСТВА!")
+            return text, {
+                'current_score': round(score, 1),
+                'is_valid': is_valid,
+                'target_score': 10.0,
+                'critical_errors': [],
+                'moderate_errors': [],
+                'missing_requirements': [],
+                'formatting_issues': [],
+                'content_gaps': [],
+            }
+        
+        text_analysis = await asyncio.to_thread(self._analyze_text, text)
+        
+        # Один проход: каждая ошибка попадает либо в критичные, либо в умеренные
+        critical_errors = []
+        moderate_errors = []
+        for err in error_list:
+            if any(rule in err for rule in _CRITICAL_RULES):
+                critical_errors.append(err)
+            else:
+                moderate_errors.append(err)
         
         # Создаем детальный отчет для основного агента
         feedback_report = {
             'current_score': round(score, 1),
             'is_valid': is_valid,
             'target_score': 10.0,
-            'critical_errors': [err for err in error_list if any(rule in err for rule in 
-                               ['no_html_tags', 'no_markdown', 'required_emoji_sections', 'news_context_usage'])],
-            'moderate_errors': [err for err in error_list if err not in [err for err in error_list if any(rule in err for rule in 
-                               ['no_html_tags', 'no_markdown', 'required_emoji_sections', 'news_context_usage'])]],
-            'missing_requirements': self._identify_missing_requirements(text),
-            'formatting_issues': self._identify_formatting_issues(text),
-            'content_gaps': self._identify_content_gaps(text),
+            'critical_errors': critical_errors,
+            'moderate_errors': moderate_errors,
+            **text_analysis,
         }
         
         logger.info("📊 ОТЧЕТ ДЛЯ ОСНОВНОГО АГЕНТА:")
@@ -658,10 +813,7 @@ class ValidationAgent:
         logger.info("� Критичные ошибки: %d", len(feedback_report['critical_errors']))
         logger.info("⚠️ Умеренные ошибки: %d", len(feedback_report['moderate_errors']))
         
-        if score >= 10.0:
-            logger.info("🎉 ОСНОВНОЙ АГЕНТ ДОСТИГ СОВЕРШЕНСТВА!")
-            return text, feedback_report
-        elif score >= 7.0:
+        if score >= 7.0:
             logger.info("✅ Основной агент достиг минимального порога, но может улучшить до 10.0")
         else:
             logger.warning("❌ ОСНОВНОЙ АГЕНТ ДОЛЖЕН КРИТИЧЕСКИ УЛУЧШИТЬ РАБОТУ")
@@ -676,11 +828,12 @@ class ValidationAgent:
             enhanced_params['improvement_instructions'] = self._create_improvement_instructions(feedback_report)
             
             try:
-                improved_text = await generation_function(**enhanced_params)
+                improved_text = await self._controlled_regeneration(generation_function, enhanced_params)
                 if improved_text and len(improved_text.strip()) > 500:
                     # Повторная валидация улучшенного текста
-                    is_improved, new_errors = self.validate_text(improved_text, analysis_type)
-                    new_score = max(1.0, 10.0 - sum([self._get_penalty_for_rule(err.split(' ')[0]) for err in new_errors]))
+                    is_improved, new_errors, new_score = await asyncio.to_thread(
+                        _fallback_validator.validate_text, improved_text, analysis_type
+                    )
                     
                     if new_score > score:
                         logger.info("📈 ОСНОВНОЙ АГЕНТ УЛУЧШИЛ РЕЗУЛЬТАТ: %.1f → %.1f", score, new_score)
@@ -696,23 +849,35 @@ class ValidationAgent:
         improved_text = await self.validate_and_fix(text, analysis_type, original_prompt)
         return improved_text, feedback_report
     
+    async def _controlled_regeneration(self, generation_function, params: Dict[str, Any]) -> str:
+        """Регенерация текста с ограничением числа одновременных запросов"""
+        async with _regeneration_semaphore:
+            return await generation_function(**params)
+    
+    def _analyze_text(self, text: str) -> Dict[str, List[str]]:
+        """Недостающие требования, проблемы форматирования и пробелы в содержании"""
+        return {
+            'missing_requirements': self._identify_missing_requirements(text),
+            'formatting_issues': self._identify_formatting_issues(text),
+            'content_gaps': self._identify_content_gaps(text),
+        }
+    
     def _identify_missing_requirements(self, text: str) -> List[str]:
         """Определить отсутствующие требования из промпта"""
         missing = []
         
         # Проверка обязательных блоков
-        required_emojis = ['🌟', '🔮', '💎', '🧘', '⚠️', '💼']
-        for emoji in required_emojis:
+        for emoji in _BLOCK_EMOJI_ORDER:
             if emoji not in text:
                 missing.append(f"Отсутствует блок с эмодзи {emoji}")
         
         # Проверка новостного контекста
-        if 'новост' not in text.lower() and 'событ' not in text.lower():
+        text_lower = text.lower()
+        if 'новост' not in text_lower and 'событ' not in text_lower:
             missing.append("Отсутствует контекст актуальных новостей")
         
         # Проверка примеров компаний
-        company_keywords = ['компани', 'корпораци', 'бренд', 'apple', 'microsoft', 'google']
-        if not any(keyword in text.lower() for keyword in company_keywords):
+        if not any(keyword in text_lower for keyword in _COMPANY_KEYWORDS):
             missing.append("Отсутствуют примеры известных компаний")
             
         return missing
@@ -722,15 +887,15 @@ class ValidationAgent:
         issues = []
         
         # HTML теги
-        if re.search(r'<[^>]+>', text):
+        if _HTML_TAG_RE.search(text):
             issues.append("Обнаружены HTML-теги (запрещены для Telegram)")
         
         # Markdown
-        if re.search(r'\*\*[^*]+\*\*|__[^_]+__|^#{1,6}\s', text, re.MULTILINE):
+        if _FORMATTING_MARKDOWN_RE.search(text):
             issues.append("Обнаружен Markdown (запрещен для Telegram)")
         
         # Обычные маркеры
-        if re.search(r'^\s*[\*\-•]\s', text, re.MULTILINE):
+        if _FORMATTING_BULLET_RE.search(text):
             issues.append("Используются обычные маркеры вместо графических иконок")
             
         return issues
@@ -740,17 +905,17 @@ class ValidationAgent:
         gaps = []
         
         # Проверка объема
-        word_count = len(text.split())
+        # Делим не больше 1500 раз: точное число нужно только ниже порога
+        word_count = len(text.split(None, 1500))
         if word_count < 1500:
             gaps.append(f"Недостаточный объем: {word_count} слов (нужно 1500+)")
         
         # Проверка астрологических символов
-        astro_symbols = ['♈', '♉', '♊', '♋', '♌', '♍', '♎', '♏', '♐', '♑', '♒', '♓']
-        if not any(symbol in text for symbol in astro_symbols):
+        if not any(symbol in text for symbol in _ZODIAC_SIGNS):
             gaps.append("Отсутствуют астрологические символы")
         
         # Проверка эмодзи
-        emoji_count = len(re.findall(r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F1E0-\U0001F1FF\U00002600-\U000027BF\U0001F900-\U0001F9FF]', text))
+        emoji_count = sum(1 for _ in islice(_EMOJI_RE.finditer(text), 10))
         if emoji_count < 10:
             gaps.append(f"Недостаточно эмодзи: {emoji_count} (нужно 10+)")
             
@@ -765,18 +930,15 @@ class ValidationAgent:
         
         if feedback['critical_errors']:
             instructions.append("🚨 КРИТИЧНЫЕ ОШИБКИ (исправь ОБЯЗАТЕЛЬНО):")
-            for error in feedback['critical_errors'][:5]:
-                instructions.append(f"  - {error}")
+            instructions.append("  - " + "\n  - ".join(islice(feedback['critical_errors'], 5)))
         
         if feedback['missing_requirements']:
             instructions.append("📋 ОТСУТСТВУЮЩИЕ ТРЕБОВАНИЯ:")
-            for req in feedback['missing_requirements']:
-                instructions.append(f"  - {req}")
+            instructions.append("  - " + "\n  - ".join(feedback['missing_requirements']))
         
         if feedback['formatting_issues']:
             instructions.append("🎨 ПРОБЛЕМЫ ФОРМАТИРОВАНИЯ:")
-            for issue in feedback['formatting_issues']:
-                instructions.append(f"  - {issue}")
+            instructions.append("  - " + "\n  - ".join(feedback['formatting_issues']))
         
         instructions.append("💡 КЛЮЧЕВЫЕ ТРЕБОВАНИЯ ДЛЯ ОЦЕНКИ 10/10:")
         instructions.append("  - ВСЕ 6 блоков с правильными эмодзи")